@@ -3,6 +3,13 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from memepie.images import Variant, variant_url
+
+# Renditions generated at upload, see memepie/images.py
+PROFILE_PIC_VARIANTS = {
+    'avatar': Variant(160, True, 'JPEG'),
+}
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_pic = models.ImageField(default='default.jpg', upload_to='profile_pics')
@@ -15,10 +22,16 @@ class Profile(models.Model):
         ('O', 'Other'),
     ]
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True)
+    # Storage names of the PROFILE_PIC_VARIANTS renditions
+    profile_pic_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f'{self.user.username} Profile'
 
+    @property
+    def avatar_url(self):
+        return variant_url(self.profile_pic, self.profile_pic_variants, 'avatar')
+
 class Block(models.Model):
     blocker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blocking')
     blocked = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blocked_by')
@@ -39,3 +52,8 @@ def create_profile(sender, instance, created, **kwargs):
 def save_profile(sender, instance, **kwargs):
     instance.profile.save()
 
+
+@receiver(post_save, sender=Profile)
+def update_profile_pic_typeahead(sender, instance, **kwargs):
+    from memes.typeahead import typeahead
+    typeahead.update_profile_pic(instance.user_id, instance.profile_pic_variants.get('avatar') or instance.profile_pic.name)
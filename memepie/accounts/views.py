@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from .forms import UserRegisterForm, UserLoginForm, UserUpdateForm, ProfileUpdateForm
 from .models import Block
+from memes.media_jobs import enqueue_profile_pic
 from django.http import JsonResponse
 from django.contrib import messages
 
@@ -14,7 +15,9 @@ def profile_edit(request):
         p_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
-            p_form.save()
+            profile = p_form.save()
+            if 'profile_pic' in p_form.changed_data:
+                enqueue_profile_pic(profile)
             messages.success(request, f"Your profile has been updated!")
             return redirect('user_profile', username=request.user.username)
     else:
@@ -69,6 +72,8 @@ def signup_view(request):
             profile.birth_date = form.cleaned_data.get('birth_date')
             profile.gender = form.cleaned_data.get('gender')
             profile.save()
+            if form.cleaned_data.get('profile_pic'):
+                enqueue_profile_pic(profile)
             
             username = form.cleaned_data.get('username')
             messages.success(request, f"Welcome {username}! Your account has been created.")
@@ -146,7 +151,9 @@ def profile_edit(request):
         p_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
-            p_form.save()
+            profile = p_form.save()
+            if 'profile_pic' in p_form.changed_data:
+                enqueue_profile_pic(profile)
             messages.success(request, f"Your profile has been updated!")
             return redirect('user_profile', username=request.user.username)
     else:
@@ -201,6 +208,8 @@ def signup_view(request):
             profile.birth_date = form.cleaned_data.get('birth_date')
             profile.gender = form.cleaned_data.get('gender')
             profile.save()
+            if form.cleaned_data.get('profile_pic'):
+                enqueue_profile_pic(profile)
             
             username = form.cleaned_data.get('username')
             messages.success(request, f"Welcome {username}! Your account has been created.")
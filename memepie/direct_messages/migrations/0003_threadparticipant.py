@@ -0,0 +1,95 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def denormalize_existing(apps, schema_editor):
+    Thread = apps.get_model('direct_messages', 'Thread')
+    Message = apps.get_model('direct_messages', 'Message')
+    ThreadParticipant = apps.get_model('direct_messages', 'ThreadParticipant')
+    for thread in Thread.objects.iterator():
+        messages = Message.objects.filter(thread_id=thread.id)
+        last = messages.order_by('-id').first()
+        thread.last_message_id = last.id if last else None
+        thread.last_activity_at = last.created_at if last else thread.updated_at
+        Thread.objects.filter(id=thread.id).update(
+            last_message_id=thread.last_message_id, last_activity_at=thread.last_activity_at
+        )
+        for membership in ThreadParticipant.objects.filter(thread_id=thread.id):
+            others = messages.exclude(sender_id=membership.user_id)
+            read = messages.filter(models.Q(is_read=True) | models.Q(sender_id=membership.user_id))
+            membership.unread_count = others.filter(is_read=False).count()
+            membership.last_read_message_id = read.order_by('-id').values_list('id', flat=True).first()
+            membership.is_accepted = thread.is_accepted or messages.filter(sender_id=membership.user_id).exists()
+            membership.save(update_fields=['unread_count', 'last_read_message', 'is_accepted'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('direct_messages', '0002_thread_is_accepted'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Adopt the implicit participants table as an explicit through model
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ThreadParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='direct_messages.thread')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'direct_messages_thread_participants',
+                        'unique_together': {('thread', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='thread',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='threads', through='direct_messages.ThreadParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AlterModelTable(
+            name='threadparticipant',
+            table=None,
+        ),
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='is_accepted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='is_muted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='direct_messages.message'),
+        ),
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='last_activity_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='direct_messages.message'),
+        ),
+        migrations.RunPython(denormalize_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('direct_messages', '0003_threadparticipant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', 'created_at', 'id'], name='message_thread_history_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def assign_pair_keys(apps, schema_editor):
+    # Key every two-person thread, folding duplicates for the same pair into the oldest one
+    Thread = apps.get_model('direct_messages', 'Thread')
+    Message = apps.get_model('direct_messages', 'Message')
+    ThreadParticipant = apps.get_model('direct_messages', 'ThreadParticipant')
+    pairs = {}
+    for thread in Thread.objects.annotate(members=Count('memberships')).filter(members=2).order_by('id'):
+        user_ids = sorted(ThreadParticipant.objects.filter(thread_id=thread.id).values_list('user_id', flat=True))
+        pairs.setdefault(f'{user_ids[0]}:{user_ids[1]}', []).append(thread)
+
+    for key, (keep, *duplicates) in pairs.items():
+        if duplicates:
+            duplicate_ids = [thread.id for thread in duplicates]
+            Message.objects.filter(thread_id__in=duplicate_ids).update(thread_id=keep.id)
+            for membership in ThreadParticipant.objects.filter(thread_id=keep.id):
+                others = ThreadParticipant.objects.filter(thread_id__in=duplicate_ids, user_id=membership.user_id)
+                totals = others.aggregate(unread=Sum('unread_count'), last_read=Max('last_read_message_id'))
+                membership.unread_count += totals['unread'] or 0
+                membership.last_read_message_id = max(
+                    filter(None, [membership.last_read_message_id, totals['last_read']]), default=None
+                )
+                membership.is_accepted = membership.is_accepted or others.filter(is_accepted=True).exists()
+                membership.save()
+            last = Message.objects.filter(thread_id=keep.id).order_by('-id').first()
+            keep.is_accepted = keep.is_accepted or any(thread.is_accepted for thread in duplicates)
+            keep.last_message_id = last.id if last else None
+            keep.last_activity_at = max(thread.last_activity_at for thread in [keep, *duplicates])
+            Thread.objects.filter(id__in=duplicate_ids).delete()
+        keep.pair_key = key
+        keep.save(update_fields=['pair_key', 'is_accepted', 'last_message', 'last_activity_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('direct_messages', '0004_message_thread_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='pair_key',
+            field=models.CharField(blank=True, max_length=41, null=True, unique=True),
+        ),
+        migrations.RunPython(assign_pair_keys, migrations.RunPython.noop),
+    ]
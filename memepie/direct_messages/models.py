@@ -1,11 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
-from memes.models import Meme
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from memes.models import Meme, Follow
+from memepie import realtime, unread
 
 class Thread(models.Model):
-    participants = models.ManyToManyField(User, related_name='threads')
+    participants = models.ManyToManyField(User, related_name='threads', through='ThreadParticipant')
     is_accepted = models.BooleanField(default=False)
     updated_at = models.DateTimeField(auto_now=True)
+    # "low_id:high_id" of the two users in a direct thread, see threads.pair_key
+    pair_key = models.CharField(max_length=41, unique=True, null=True, blank=True)
+    # Kept current by Message.save so listings never scan messages
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         ordering = ['-updated_at']
@@ -23,7 +33,86 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Chat history pages walk a thread by (created_at, id)
+            models.Index(fields=['thread', 'created_at', 'id'], name='message_thread_history_idx'),
+        ]
 
     def __str__(self):
         content = self.text[:20] if self.text else "[Shared Meme]"
         return f"{self.sender.username}: {content}"
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                Thread.objects.filter(pk=self.thread_id).update(
+                    last_message=self, last_activity_at=self.created_at, updated_at=self.created_at
+                )
+                ThreadParticipant.objects.filter(thread_id=self.thread_id).exclude(user_id=self.sender_id).update(
+                    unread_count=F('unread_count') + 1
+                )
+                ThreadParticipant.objects.filter(thread_id=self.thread_id, user_id=self.sender_id).update(
+                    is_accepted=True
+                )
+        if created:
+            # Keep a loaded thread in step so a later thread.save() can't roll these back
+            self.thread.last_message = self
+            self.thread.last_activity_at = self.thread.updated_at = self.created_at
+
+
+class ThreadParticipant(models.Model):
+    """One user's side of a thread: how far they have read, and whether they accepted or muted it."""
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='thread_memberships')
+    last_read_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    unread_count = models.PositiveIntegerField(default=0)
+    is_accepted = models.BooleanField(default=False)
+    is_muted = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('thread', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} in thread {self.thread_id}"
+
+def message_event(message):
+    """Payload of the `message` event pushed to recipients."""
+    return {
+        'id': message.id,
+        'thread_id': message.thread_id,
+        'sender': message.sender.username,
+        'text': message.text[:100],
+        'meme_id': message.meme_id,
+    }
+
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    if created:
+        memberships = list(
+            instance.thread.memberships.exclude(user_id=instance.sender_id).values_list('user_id', 'is_muted')
+        )
+        recipients = [user_id for user_id, is_muted in memberships]
+        unread.adjust(unread.MESSAGES, recipients, 1)
+        realtime.publish([user_id for user_id, is_muted in memberships if not is_muted], 'message', message_event(instance))
+        realtime.publish_unread_counts(recipients)
+
+@receiver(post_save, sender=Message)
+def invalidate_thread_summaries(sender, instance, created, **kwargs):
+    if created:
+        from .summaries import bump_thread_summaries
+        bump_thread_summaries(instance.thread.participants.values_list('id', flat=True))
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def invalidate_participant_summaries(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set:
+        from .summaries import bump_thread_summaries
+        bump_thread_summaries([instance.pk] if reverse else pk_set)
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reclassify_follower_threads(sender, instance, **kwargs):
+    # Following someone moves their thread out of requests
+    from .summaries import bump_thread_summaries
+    bump_thread_summaries([instance.follower_id])
@@ -0,0 +1,79 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from memes.models import Follow
+from .models import ThreadParticipant
+
+
+def _version_key(user_id):
+    return f'threads:version:{user_id}'
+
+
+def bump_thread_summaries(user_ids):
+    """Invalidate the cached thread list of each given user."""
+    cache.set_many({_version_key(user_id): uuid.uuid4().hex[:12] for user_id in user_ids}, None)
+
+
+def build_thread_summaries(user):
+    """
+    Every thread `user` takes part in, most recently active first, each with
+    other_user (profile loaded), last_message (sender loaded), membership,
+    is_unread and is_primary set. A thread is primary once accepted, either
+    for the whole thread or by this user, or when the user follows the other
+    participant; the rest are requests. Three queries however many threads
+    there are.
+    """
+    memberships = list(
+        ThreadParticipant.objects.filter(user=user)
+        .select_related('thread__last_message__sender')
+        .order_by('-thread__last_activity_at', '-thread_id')
+    )
+    if not memberships:
+        return []
+
+    others = {
+        m.thread_id: m.user
+        for m in ThreadParticipant.objects.filter(thread_id__in=[m.thread_id for m in memberships])
+        .exclude(user_id=user.id).select_related('user__profile')
+    }
+    followed = set(
+        Follow.objects.filter(follower=user, following_id__in=[u.id for u in others.values()])
+        .values_list('following_id', flat=True)
+    )
+
+    threads = []
+    for membership in memberships:
+        thread = membership.thread
+        thread.membership = membership
+        thread.is_unread = membership.unread_count > 0
+        thread.other_user = others.get(thread.id)
+        thread.is_primary = (
+            thread.is_accepted or membership.is_accepted
+            or (thread.other_user is not None and thread.other_user.id in followed)
+        )
+        threads.append(thread)
+    return threads
+
+
+def thread_summaries(user):
+    """build_thread_summaries, cached per user until one of their threads changes."""
+    version = cache.get(_version_key(user.id))
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        cache.add(_version_key(user.id), version, None)
+        version = cache.get(_version_key(user.id))
+    key = f'threads:{user.id}:{version}'
+    threads = cache.get(key)
+    if threads is None:
+        threads = build_thread_summaries(user)
+        cache.set(key, threads, settings.THREAD_SUMMARY_CACHE_TTL)
+    return threads
+
+
+def split_threads(threads):
+    """(primary, requests) in the same order as `threads`."""
+    primary = [t for t in threads if t.is_primary]
+    requests = [t for t in threads if not t.is_primary]
+    return primary, requests
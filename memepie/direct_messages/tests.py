@@ -1,8 +1,16 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import Thread, Message
-from memes.models import Follow
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Thread, Message, ThreadParticipant
+from .summaries import build_thread_summaries, split_threads, thread_summaries
+from .threads import get_or_create_direct_thread, pair_key
+from memes.models import Follow, Meme
+from memes.notifications import Event, notify
+from memepie import realtime, unread
 
 class DirectMessagesTests(TestCase):
     def setUp(self):
@@ -62,6 +70,13 @@ class DirectMessagesTests(TestCase):
         response = self.client.get(reverse('inbox'))
         self.assertEqual(len(response.context['threads']), 1)
 
+    def test_inbox_title_and_listener(self):
+        """The live-update listener is rendered once, in the page body and not the title."""
+        self.client.login(username='user2', password='password1')
+        response = self.client.get(reverse('inbox'))
+        self.assertContains(response, '<title>Messages • MemePie</title>', html=True)
+        self.assertContains(response, "addEventListener('memepie:message'", count=1)
+
     def test_auto_accept_mutual_follow(self):
         """Test that mutual follows result in an automatically accepted thread."""
         Follow.objects.create(follower=self.user1, following=self.user2)
@@ -91,3 +106,350 @@ class DirectMessagesTests(TestCase):
         # Message should be read
         msg = Message.objects.first()
         self.assertTrue(msg.is_read)
+
+
+class UnreadCountsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password1')
+        self.thread = Thread.objects.create(is_accepted=True)
+        self.thread.participants.add(self.user1, self.user2)
+
+    def badges(self, user):
+        self.client.force_login(user)
+        response = self.client.get(reverse('inbox'))
+        return response.context['unread_messages_count'], response.context['unread_notifications_count']
+
+    def test_cached_badges_cost_no_queries(self):
+        unread.unread_counts(self.user2.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.unread_counts(self.user2.id), {'messages': 0, 'notifications': 0})
+
+    def test_messages_are_counted_and_read(self):
+        self.assertEqual(self.badges(self.user2), (0, 0))
+        Message.objects.create(thread=self.thread, sender=self.user1, text="One")
+        Message.objects.create(thread=self.thread, sender=self.user1, text="Two")
+        self.assertEqual(unread.unread_counts(self.user2.id)['messages'], 2)
+        self.assertEqual(unread.unread_counts(self.user1.id)['messages'], 0)
+
+        self.client.force_login(self.user2)
+        self.client.get(reverse('chat_detail', args=[self.thread.id]))
+        self.assertEqual(unread.unread_counts(self.user2.id)['messages'], 0)
+
+    def test_notifications_are_counted_and_seen(self):
+        self.assertEqual(self.badges(self.user2), (0, 0))
+        notify([Event(self.user2.id, self.user1.id, 'follow', None, "user1 started following you")])
+        self.assertEqual(unread.unread_counts(self.user2.id)['notifications'], 1)
+        notify([Event(self.user2.id, self.user1.id, 'follow', None, "user1 started following you")])
+        self.assertEqual(unread.unread_counts(self.user2.id)['notifications'], 1)
+
+        self.client.force_login(self.user2)
+        self.client.get(reverse('notifications'))
+        self.assertEqual(unread.unread_counts(self.user2.id)['notifications'], 0)
+
+    def test_reconcile_repairs_drift(self):
+        Message.objects.create(thread=self.thread, sender=self.user1, text="Hi")
+        notify([Event(self.user2.id, self.user1.id, 'follow', None, "user1 started following you")])
+        unread.reset(unread.MESSAGES, self.user2.id, 7)
+        unread.reset(unread.NOTIFICATIONS, self.user2.id, 7)
+        self.assertEqual(unread.reconcile(), 2)
+        self.assertEqual(unread.unread_counts(self.user2.id), {'messages': 1, 'notifications': 1})
+        self.assertEqual(unread.unread_counts(self.user1.id), {'messages': 0, 'notifications': 0})
+
+
+class RecordingBackend(realtime.InProcessBackend):
+    published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+        super().publish(channel, event)
+
+
+@override_settings(REALTIME_BACKEND='direct_messages.tests.RecordingBackend')
+class RealtimeTests(TestCase):
+    def setUp(self):
+        realtime.get_backend.cache_clear()
+        RecordingBackend.published = []
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password1')
+        self.thread = Thread.objects.create(is_accepted=True)
+        self.thread.participants.add(self.user1, self.user2)
+
+    def tearDown(self):
+        realtime.get_backend.cache_clear()
+
+    def test_new_message_is_pushed_to_recipient(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(thread=self.thread, sender=self.user1, text="Hello")
+        events = [(channel, event['type']) for channel, event in RecordingBackend.published]
+        self.assertEqual(events, [(f'user:{self.user2.id}', 'message'), (f'user:{self.user2.id}', 'unread')])
+        self.assertEqual(RecordingBackend.published[1][1]['data'], {'messages': 1, 'notifications': 0})
+
+    def test_notification_is_pushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify([Event(self.user2.id, self.user1.id, 'follow', None, "user1 started following you")])
+        types = [event['type'] for channel, event in RecordingBackend.published]
+        self.assertEqual(types, ['notification', 'unread'])
+
+    def test_reading_pushes_read_event_once(self):
+        Message.objects.create(thread=self.thread, sender=self.user1, text="Hello")
+        RecordingBackend.published = []
+        self.client.force_login(self.user2)
+        url = reverse('chat_messages', args=[self.thread.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url, {'after': 0})
+        reads = [(channel, event['data']) for channel, event in RecordingBackend.published if event['type'] == 'read']
+        self.assertEqual(sorted(channel for channel, data in reads), [f'user:{self.user1.id}', f'user:{self.user2.id}'])
+        self.assertEqual(reads[0][1], {'thread_id': self.thread.id, 'reader': 'user2'})
+
+        # Polling again with nothing unread writes nothing and pushes nothing
+        RecordingBackend.published = []
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'after': 0})
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual(RecordingBackend.published, [])
+
+    def test_inbox_row_fragment(self):
+        Message.objects.create(thread=self.thread, sender=self.user1, text="Hello")
+        self.client.force_login(self.user2)
+        data = self.client.get(reverse('thread_row', args=[self.thread.id])).json()
+        self.assertTrue(data['is_primary'])
+        self.assertIn(f'data-thread-id="{self.thread.id}"', data['html'])
+        self.assertIn('unread-dot', data['html'])
+        other = Thread.objects.create()
+        self.assertEqual(self.client.get(reverse('thread_row', args=[other.id])).status_code, 404)
+
+    def test_stream_requires_login(self):
+        self.assertEqual(self.client.get(reverse('event_stream')).status_code, 401)
+
+    def test_wsgi_fallback_sends_snapshot(self):
+        self.client.force_login(self.user2)
+        response = self.client.get(reverse('event_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn(b'event: unread\ndata: {"messages": 0, "notifications": 0}', response.content)
+
+    async def test_asgi_stream_delivers_events(self):
+        await self.async_client.aforce_login(self.user2)
+        response = await self.async_client.get(reverse('event_stream'))
+        chunks = aiter(response.streaming_content)
+        self.assertIn(b'event: unread', await anext(chunks))
+
+        realtime.get_backend().publish(f'user:{self.user2.id}', {'type': 'message', 'data': {'thread_id': 1}})
+        self.assertEqual(await anext(chunks), b'event: message\ndata: {"thread_id": 1}\n\n')
+        await chunks.aclose()
+
+
+class ThreadSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password1')
+
+    def add_thread(self, name, follow=False, text="Hi"):
+        other = User.objects.create_user(username=name, password='password1')
+        thread = Thread.objects.create()
+        thread.participants.add(self.user, other)
+        Message.objects.create(thread=thread, sender=other, text=text)
+        if follow:
+            Follow.objects.create(follower=self.user, following=other)
+        return thread
+
+    def test_summaries_classify_and_describe_threads(self):
+        followed = self.add_thread('friend', follow=True, text="From a friend")
+        stranger = self.add_thread('stranger', text="From a stranger")
+        primary, requests = split_threads(build_thread_summaries(self.user))
+        self.assertEqual([t.id for t in primary], [followed.id])
+        self.assertEqual([t.id for t in requests], [stranger.id])
+        self.assertEqual(primary[0].other_user.username, 'friend')
+        self.assertEqual(primary[0].last_message.text, "From a friend")
+        self.assertTrue(primary[0].is_unread)
+
+    def test_query_count_is_flat(self):
+        self.add_thread('first', follow=True)
+        with CaptureQueriesContext(connection) as few:
+            build_thread_summaries(self.user)
+        for i in range(5):
+            self.add_thread(f'more{i}', follow=bool(i % 2))
+        with CaptureQueriesContext(connection) as many:
+            build_thread_summaries(self.user)
+        self.assertEqual(len(few), len(many))
+
+    def test_cache_follows_thread_changes(self):
+        thread = self.add_thread('friend')
+        self.assertFalse(thread_summaries(self.user)[0].is_primary)
+        with self.assertNumQueries(0):
+            thread_summaries(self.user)
+
+        Follow.objects.create(follower=self.user, following=User.objects.get(username='friend'))
+        self.assertTrue(thread_summaries(self.user)[0].is_primary)
+
+        Message.objects.create(thread=thread, sender=self.user, text="Reply")
+        self.assertEqual(thread_summaries(self.user)[0].last_message.text, "Reply")
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('chat_detail', args=[thread.id]))
+        self.assertEqual(len(response.context['primary_threads']), 1)
+        self.assertFalse(thread_summaries(self.user)[0].is_unread)
+
+
+class ThreadParticipantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password1')
+        self.thread = Thread.objects.create(is_accepted=True)
+        self.thread.participants.add(self.user1, self.user2)
+
+    def membership(self, user):
+        return ThreadParticipant.objects.get(thread=self.thread, user=user)
+
+    def test_sending_updates_thread_and_counters(self):
+        Message.objects.create(thread=self.thread, sender=self.user1, text="One")
+        last = Message.objects.create(thread=self.thread, sender=self.user1, text="Two")
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message, last)
+        self.assertEqual(self.thread.last_activity_at, last.created_at)
+        self.assertEqual(self.membership(self.user2).unread_count, 2)
+        self.assertEqual(self.membership(self.user1).unread_count, 0)
+        self.assertTrue(self.membership(self.user1).is_accepted)
+
+    def test_opening_thread_moves_read_marker(self):
+        last = Message.objects.create(thread=self.thread, sender=self.user1, text="Hi")
+        self.client.force_login(self.user2)
+        self.client.get(reverse('chat_detail', args=[self.thread.id]))
+        membership = self.membership(self.user2)
+        self.assertEqual(membership.unread_count, 0)
+        self.assertEqual(membership.last_read_message_id, last.id)
+
+    def test_sender_side_of_new_chat_is_accepted(self):
+        self.client.force_login(self.user1)
+        user3 = User.objects.create_user(username='user3', password='password1')
+        self.client.get(reverse('start_chat', args=['user3']))
+        thread = Thread.objects.get(participants=user3)
+        response = self.client.get(reverse('chat_detail', args=[thread.id]))
+        self.assertFalse(response.context['is_request'])
+        self.assertFalse(ThreadParticipant.objects.get(thread=thread, user=user3).is_accepted)
+
+    def test_muted_thread_is_not_pushed(self):
+        self.client.force_login(self.user2)
+        self.client.post(reverse('toggle_mute', args=[self.thread.id]))
+        self.assertTrue(self.membership(self.user2).is_muted)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Message.objects.create(thread=self.thread, sender=self.user1, text="Shh")
+        self.assertEqual(len(callbacks), 1)  # only the badge refresh
+        self.assertEqual(unread.unread_counts(self.user2.id)['messages'], 1)
+
+
+@override_settings(CHAT_PAGE_SIZE=3)
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password1')
+        self.thread = Thread.objects.create(is_accepted=True)
+        self.thread.participants.add(self.user1, self.user2)
+        self.messages = [
+            Message.objects.create(thread=self.thread, sender=self.user1, text=f"Message {i}") for i in range(7)
+        ]
+        self.client.force_login(self.user2)
+
+    def test_chat_opens_on_latest_page(self):
+        response = self.client.get(reverse('chat_detail', args=[self.thread.id]))
+        self.assertEqual([m.text for m in response.context['chat_messages']], ["Message 4", "Message 5", "Message 6"])
+        self.assertIsNotNone(response.context['older_cursor'])
+
+    def test_scrolling_back_walks_to_the_start(self):
+        cursor = self.client.get(reverse('chat_detail', args=[self.thread.id])).context['older_cursor']
+        seen = []
+        while cursor:
+            data = self.client.get(reverse('chat_messages', args=[self.thread.id]), {'before': cursor}).json()
+            seen.insert(0, data['count'])
+            cursor = data['next_cursor']
+        self.assertEqual(seen, [1, 3])
+
+    def test_newer_messages_since_id(self):
+        Message.objects.create(thread=self.thread, sender=self.user1, text="Fresh")
+        data = self.client.get(
+            reverse('chat_messages', args=[self.thread.id]), {'after': self.messages[-1].id}
+        ).json()
+        self.assertEqual(data['count'], 1)
+        self.assertIn("Fresh", data['html'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(ThreadParticipant.objects.get(thread=self.thread, user=self.user2).unread_count, 0)
+
+    def test_bad_requests(self):
+        url = reverse('chat_messages', args=[self.thread.id])
+        self.assertEqual(self.client.get(url, {'before': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'after': 'nope'}).status_code, 400)
+        outsider = User.objects.create_user(username='outsider', password='password1')
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class DirectThreadTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password1')
+
+    def test_pair_key_is_order_independent(self):
+        self.assertEqual(pair_key(self.user1.id, self.user2.id), pair_key(self.user2.id, self.user1.id))
+
+    def test_both_sides_resolve_one_thread(self):
+        thread, created = get_or_create_direct_thread(self.user1, self.user2)
+        self.assertTrue(created)
+        self.assertEqual(set(thread.participants.all()), {self.user1, self.user2})
+        with self.assertNumQueries(1):
+            again, created = get_or_create_direct_thread(self.user2, self.user1)
+        self.assertFalse(created)
+        self.assertEqual(again, thread)
+
+    def test_start_chat_and_share_reuse_the_thread(self):
+        self.client.force_login(self.user1)
+        self.client.get(reverse('start_chat', args=['user2']))
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        meme = Meme.objects.create(author=self.user2, caption="Shared", image=image)
+        self.client.post(reverse('share_meme', args=[meme.id]), {'recipient_id': self.user2.id})
+        self.client.force_login(self.user2)
+        self.client.get(reverse('start_chat', args=['user1']))
+        self.assertEqual(Thread.objects.count(), 1)
+        self.assertEqual(Thread.objects.get().messages.get().meme, meme)
+
+
+class BulkShareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sender = User.objects.create_user(username='sender', password='password1')
+        self.friends = [User.objects.create_user(username=f'friend{i}', password='password1') for i in range(4)]
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        self.meme = Meme.objects.create(author=self.sender, caption="Shared", image=image)
+        self.existing, _ = get_or_create_direct_thread(self.sender, self.friends[0])
+        self.client.force_login(self.sender)
+
+    def share(self, users):
+        return self.client.post(reverse('share_meme', args=[self.meme.id]), {'recipient_id': [u.id for u in users]})
+
+    def test_share_reaches_every_recipient(self):
+        response = self.share(self.friends)
+        self.assertEqual(response.json(), {'status': 'success', 'sent': 4})
+        self.assertEqual(Thread.objects.count(), 4)
+        for friend in self.friends:
+            thread = Thread.objects.get(pair_key=pair_key(self.sender.id, friend.id))
+            self.assertEqual(thread.last_message.meme, self.meme)
+            self.assertEqual(ThreadParticipant.objects.get(thread=thread, user=friend).unread_count, 1)
+            self.assertEqual(unread.unread_counts(friend.id)['messages'], 1)
+        self.assertEqual(Message.objects.filter(thread=self.existing).count(), 1)
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        with CaptureQueriesContext(connection) as few:
+            self.share(self.friends[:2])
+        more = [User.objects.create_user(username=f'more{i}', password='password1') for i in range(6)]
+        with CaptureQueriesContext(connection) as many:
+            self.share(more + self.friends[:1])
+        self.assertEqual(len(few), len(many))
+
+    def test_rejects_bad_recipient_lists(self):
+        self.assertEqual(self.client.post(reverse('share_meme', args=[self.meme.id]), {'recipient_id': 'x'}).status_code, 400)
+        self.assertEqual(self.share([self.sender]).status_code, 404)
+        with override_settings(SHARE_MAX_RECIPIENTS=2):
+            self.assertEqual(self.share(self.friends).status_code, 400)
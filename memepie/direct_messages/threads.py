@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from memepie import realtime, unread
+from .models import Thread, Message, ThreadParticipant, message_event
+from .summaries import bump_thread_summaries
+
+
+def pair_key(user_id, other_id):
+    """Canonical key of the direct thread between two users, the same whichever side asks."""
+    low, high = sorted((user_id, other_id))
+    return f'{low}:{high}'
+
+
+def get_or_create_direct_thread(user, other):
+    """
+    The direct thread between `user` and `other`, created with both
+    participants if it does not exist yet; returns (thread, created). The
+    unique pair key makes this a single index lookup and lets concurrent
+    callers settle on one thread. `user` starts out accepted on their side.
+    """
+    key = pair_key(user.id, other.id)
+    thread = Thread.objects.filter(pair_key=key).first()
+    if thread is not None:
+        return thread, False
+    with transaction.atomic():
+        thread, created = Thread.objects.get_or_create(pair_key=key)
+        if created:
+            thread.participants.add(other)
+            thread.participants.add(user, through_defaults={'is_accepted': True})
+    return thread, created
+
+
+def send_to_many(sender, recipients, meme=None, text=''):
+    """
+    Send the same message from `sender` to each recipient's direct thread,
+    creating missing threads, in a fixed number of queries: threads and
+    memberships are resolved in bulk, messages go in with one bulk_create
+    and the thread and membership bookkeeping Message.save does per message
+    is done with one update each. Returns the created messages.
+    """
+    recipients = {user.id: user for user in recipients if user.id != sender.id}
+    if not recipients:
+        return []
+    keys = {pair_key(sender.id, user_id): user_id for user_id in recipients}
+
+    with transaction.atomic():
+        threads = {thread.pair_key: thread for thread in Thread.objects.filter(pair_key__in=keys)}
+        missing = [key for key in keys if key not in threads]
+        if missing:
+            # Another request may create some of these at the same time; the pair key decides
+            Thread.objects.bulk_create([Thread(pair_key=key) for key in missing], ignore_conflicts=True)
+            created = {thread.pair_key: thread for thread in Thread.objects.filter(pair_key__in=missing)}
+            ThreadParticipant.objects.bulk_create(
+                [ThreadParticipant(thread=created[key], user_id=keys[key]) for key in missing]
+                + [ThreadParticipant(thread=created[key], user=sender, is_accepted=True) for key in missing],
+                ignore_conflicts=True,
+            )
+            threads.update(created)
+
+        messages = Message.objects.bulk_create([
+            Message(thread=threads[key], sender=sender, meme=meme, text=text) for key in keys
+        ])
+        thread_ids = [thread.id for thread in threads.values()]
+        latest = Message.objects.filter(thread=OuterRef('pk')).order_by('-id').values('id')[:1]
+        now = messages[-1].created_at
+        Thread.objects.filter(id__in=thread_ids).update(
+            last_message=Subquery(latest), last_activity_at=now, updated_at=now
+        )
+        ThreadParticipant.objects.filter(thread_id__in=thread_ids).exclude(user_id=sender.id).update(
+            unread_count=F('unread_count') + 1
+        )
+        ThreadParticipant.objects.filter(thread_id__in=thread_ids, user_id=sender.id).update(is_accepted=True)
+        muted = set(
+            ThreadParticipant.objects.filter(thread_id__in=thread_ids, is_muted=True)
+            .exclude(user_id=sender.id).values_list('user_id', flat=True)
+        )
+
+    # What the Message post_save receivers do one message at a time
+    recipient_ids = list(recipients)
+    unread.adjust(unread.MESSAGES, recipient_ids, 1)
+    for user_id, message in zip(keys.values(), messages):
+        if user_id not in muted:
+            realtime.publish([user_id], 'message', message_event(message))
+    realtime.publish_unread_counts(recipient_ids)
+    bump_thread_summaries(recipient_ids + [sender.id])
+    return messages
@@ -4,8 +4,11 @@ from . import views
 urlpatterns = [
     path('', views.inbox, name='inbox'),
     path('<int:thread_id>/', views.chat_detail, name='chat_detail'),
+    path('<int:thread_id>/messages/', views.chat_messages, name='chat_messages'),
+    path('<int:thread_id>/row/', views.thread_row, name='thread_row'),
     path('start/<str:username>/', views.start_chat, name='start_chat'),
     path('share/<int:meme_id>/', views.share_meme, name='share_meme'),
     path('accept/<int:thread_id>/', views.accept_message_request, name='accept_request'),
     path('decline/<int:thread_id>/', views.decline_message_request, name='decline_request'),
+    path('mute/<int:thread_id>/', views.toggle_mute, name='toggle_mute'),
 ]
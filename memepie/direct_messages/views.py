@@ -1,37 +1,22 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
-from .models import Thread, Message
+from django.template.loader import render_to_string
+from .models import Thread, Message, ThreadParticipant
 from django.contrib.auth.models import User
 from memes.models import Meme, Follow
 from django.http import JsonResponse
+from memes.feed import paginate_tiers, InvalidCursor
+from memepie import realtime, unread
+from .summaries import thread_summaries, split_threads, bump_thread_summaries
+from .threads import get_or_create_direct_thread, send_to_many
 
 @login_required
 def inbox(request):
     show_requests = request.GET.get('tab') == 'requests'
-    all_threads = Thread.objects.filter(participants=request.user)
-    
-    primary_threads = []
-    request_threads = []
-    
-    for thread in all_threads:
-        other_user = thread.participants.exclude(id=request.user.id).first()
-        thread.other_user = other_user
-        
-        # Check if it should be in requests
-        # Logic: It's NOT a request if:
-        # 1. is_accepted is True
-        # 2. OR the current user follows the sender (other_user)
-        is_following = Follow.objects.filter(follower=request.user, following=other_user).exists()
-        
-        if thread.is_accepted or is_following:
-            primary_threads.append(thread)
-        else:
-            request_threads.append(thread)
-        
-        # Add is_unread flag for styling
-        thread.is_unread = thread.messages.filter(~Q(sender=request.user), is_read=False).exists()
-            
+    primary_threads, request_threads = split_threads(thread_summaries(request.user))
+
     return render(request, 'direct_messages/inbox.html', {
         'threads': request_threads if show_requests else primary_threads,
         'primary_count': len(primary_threads),
@@ -39,80 +24,167 @@ def inbox(request):
         'show_requests': show_requests
     })
 
+@login_required
+def thread_row(request, thread_id):
+    """One inbox row, re-rendered by the open inbox when a message for the thread is pushed."""
+    thread = next((t for t in thread_summaries(request.user) if t.id == thread_id), None)
+    if thread is None or thread.other_user is None:
+        return JsonResponse({'status': 'error', 'message': 'Not found'}, status=404)
+    return JsonResponse({
+        'status': 'success',
+        'is_primary': thread.is_primary,
+        'html': render_to_string('direct_messages/_thread_row.html', {
+            't': thread, 'other': thread.other_user, 'show_requests': not thread.is_primary,
+        }, request=request),
+    })
+
+def _latest_messages(thread, cursor=None):
+    # One page of history, newest first by (created_at, id), returned oldest first for display
+    queryset = thread.messages.select_related('sender__profile', 'meme')
+    messages, older_cursor = paginate_tiers(
+        [(queryset, ('created_at', 'id'))], cursor=cursor, page_size=settings.CHAT_PAGE_SIZE
+    )
+    return messages[::-1], older_cursor
+
+def _mark_read(user, thread, membership):
+    # Nothing new since the last call: no writes, no events
+    if not membership.unread_count and membership.last_read_message_id == thread.last_message_id:
+        return
+    unseen = thread.messages.filter(~Q(sender=user), is_read=False)
+    if membership.last_read_message_id:
+        unseen = unseen.filter(id__gt=membership.last_read_message_id)
+    read = unseen.update(is_read=True)
+    ThreadParticipant.objects.filter(pk=membership.pk).update(
+        last_read_message_id=thread.last_message_id, unread_count=0
+    )
+    membership.last_read_message_id, membership.unread_count = thread.last_message_id, 0
+    if read:
+        unread.adjust(unread.MESSAGES, [user.id], -read)
+        realtime.publish_unread_counts([user.id])
+        # The sender's open chat shows "Seen"; the reader's other tabs clear the inbox row
+        participant_ids = list(thread.memberships.values_list('user_id', flat=True))
+        realtime.publish(participant_ids, 'read', {'thread_id': thread.id, 'reader': user.username})
+        bump_thread_summaries([user.id])
+
+def _is_seen(thread, user):
+    # "Seen" under the last message, when it is the user's own and the other side has read it
+    last = thread.last_message
+    return last is not None and last.sender_id == user.id and last.is_read
+
 @login_required
 def chat_detail(request, thread_id):
-    thread = get_object_or_404(Thread, id=thread_id, participants=request.user)
-    messages = thread.messages.all()
+    membership = get_object_or_404(
+        ThreadParticipant.objects.select_related('thread__last_message'), thread_id=thread_id, user=request.user
+    )
+    thread = membership.thread
     other_user = thread.participants.exclude(id=request.user.id).first()
     
     # Check if this thread is currently a request for the current user
     # (i.e., not accepted and user doesn't follow sender)
     is_following = Follow.objects.filter(follower=request.user, following=other_user).exists()
-    is_request = not thread.is_accepted and not is_following
+    is_request = not (thread.is_accepted or membership.is_accepted) and not is_following
     
-    # Pre-calculate thread lists for sidebar
-    all_sidebar_threads = Thread.objects.filter(participants=request.user)
-    primary_threads = []
-    request_threads = []
-    for t in all_sidebar_threads:
-        t_other = t.participants.exclude(id=request.user.id).first()
-        t.other_user = t_other
-        t.is_unread = t.messages.filter(~Q(sender=request.user), is_read=False).exists()
-        # last message snippet
-        last_msg = t.messages.last()
-        t.last_message = last_msg
-        is_f = Follow.objects.filter(follower=request.user, following=t_other).exists() if t_other else False
-        if t.is_accepted or is_f:
-            primary_threads.append(t)
-        else:
-            request_threads.append(t)
+    # Thread lists for sidebar
+    primary_threads, request_threads = split_threads(thread_summaries(request.user))
 
     if request.method == 'POST' and not is_request:
         text = request.POST.get('text', '').strip()
         if text:
             Message.objects.create(thread=thread, sender=request.user, text=text)
-            thread.save() # Update updated_at
             return redirect('chat_detail', thread_id=thread.id)
             
-    # Mark messages as read
-    thread.messages.filter(~Q(sender=request.user), is_read=False).update(is_read=True)
+    messages, older_cursor = _latest_messages(thread)
+    _mark_read(request.user, thread, membership)
     
     return render(request, 'direct_messages/chat.html', {
         'thread': thread,
         'chat_messages': messages,
+        'older_cursor': older_cursor,
+        'is_seen': _is_seen(thread, request.user),
         'other_user': other_user,
         'primary_threads': primary_threads,
         'request_threads': request_threads,
         'primary_count': len(primary_threads),
         'request_count': len(request_threads),
-        'is_request': is_request
+        'is_request': is_request,
+        'is_muted': membership.is_muted
+    })
+
+@login_required
+def chat_messages(request, thread_id):
+    """
+    Message fragments for an open chat. `?before=<cursor>` returns the page
+    older than the cursor the chat handed out; `?after=<id>` returns messages
+    newer than that id (at most a page, with has_more) and marks them read.
+    """
+    membership = get_object_or_404(
+        ThreadParticipant.objects.select_related('thread__last_message'), thread_id=thread_id, user=request.user
+    )
+    thread = membership.thread
+    data = {}
+    if 'after' in request.GET:
+        try:
+            after = int(request.GET['after'])
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid id'}, status=400)
+        page_size = settings.CHAT_PAGE_SIZE
+        batch = list(
+            thread.messages.select_related('sender__profile', 'meme').filter(id__gt=after).order_by('id')[:page_size + 1]
+        )
+        messages = batch[:page_size]
+        data['has_more'] = len(batch) > page_size
+        _mark_read(request.user, thread, membership)
+    else:
+        try:
+            messages, data['next_cursor'] = _latest_messages(thread, request.GET.get('before'))
+        except InvalidCursor:
+            return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'html': render_to_string('direct_messages/_messages.html', {'chat_messages': messages}, request=request),
+        'count': len(messages),
+        'last_id': messages[-1].id if messages else None,
+        'seen': _is_seen(thread, request.user),
+        **data,
     })
 
 @login_required
 def accept_message_request(request, thread_id):
     thread = get_object_or_404(Thread, id=thread_id, participants=request.user)
     thread.is_accepted = True
-    thread.save()
+    thread.save(update_fields=['is_accepted'])
+    ThreadParticipant.objects.filter(thread=thread, user=request.user).update(is_accepted=True)
+    bump_thread_summaries(thread.participants.values_list('id', flat=True))
     return redirect('chat_detail', thread_id=thread.id)
 
 @login_required
 def decline_message_request(request, thread_id):
     thread = get_object_or_404(Thread, id=thread_id, participants=request.user)
+    # Its unread messages go with it, so recount the badges
+    participant_ids = list(thread.participants.values_list('id', flat=True))
+    unread.forget(unread.MESSAGES, participant_ids)
+    bump_thread_summaries(participant_ids)
     thread.delete()
     return redirect('inbox')
 
+@login_required
+def toggle_mute(request, thread_id):
+    membership = get_object_or_404(ThreadParticipant, thread_id=thread_id, user=request.user)
+    if request.method == 'POST':
+        membership.is_muted = not membership.is_muted
+        membership.save(update_fields=['is_muted'])
+    return redirect('chat_detail', thread_id=thread_id)
+
 @login_required
 def start_chat(request, username):
     other_user = get_object_or_404(User, username=username)
     if other_user == request.user:
         return redirect('inbox')
         
-    thread = Thread.objects.filter(participants=request.user).filter(participants=other_user).first()
+    thread, created = get_or_create_direct_thread(request.user, other_user)
     
-    if not thread:
-        thread = Thread.objects.create()
-        thread.participants.add(request.user, other_user)
-        
+    if created:
         # Auto-accept if there's mutual interest/follow
         # Instagram logic: If I follow them, and they message me, it's accepted? 
         # Actually, if WE follow THEM, we probably want their messages.
@@ -120,7 +192,7 @@ def start_chat(request, username):
         other_follows_me = Follow.objects.filter(follower=other_user, following=request.user).exists()
         if other_follows_me:
             thread.is_accepted = True
-            thread.save()
+            thread.save(update_fields=['is_accepted'])
             
     return redirect('chat_detail', thread_id=thread.id)
 
@@ -128,17 +200,19 @@ def start_chat(request, username):
 def share_meme(request, meme_id):
     meme = get_object_or_404(Meme, id=meme_id)
     if request.method == 'POST':
-        recipient_id = request.POST.get('recipient_id')
-        recipient = get_object_or_404(User, id=recipient_id)
-        
-        thread = Thread.objects.filter(participants=request.user).filter(participants=recipient).first()
-        if not thread:
-            thread = Thread.objects.create()
-            thread.participants.add(request.user, recipient)
-            
-        Message.objects.create(thread=thread, sender=request.user, meme=meme)
-        thread.save()
-        
-        return JsonResponse({'status': 'success'})
+        # One or more recipient_id values; every recipient gets the meme in their direct thread
+        try:
+            recipient_ids = {int(value) for value in request.POST.getlist('recipient_id')}
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid recipient'}, status=400)
+        if len(recipient_ids) > settings.SHARE_MAX_RECIPIENTS:
+            return JsonResponse({'status': 'error', 'message': 'Too many recipients'}, status=400)
+
+        recipients = list(User.objects.filter(id__in=recipient_ids).exclude(id=request.user.id))
+        if not recipients:
+            return JsonResponse({'status': 'error', 'message': 'Invalid recipient'}, status=404)
+
+        messages = send_to_many(request.user, recipients, meme=meme)
+        return JsonResponse({'status': 'success', 'sent': len(messages)})
     
     return JsonResponse({'status': 'error', 'message': 'Invalid request'})
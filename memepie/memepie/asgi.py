@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'memepie.settings')
 
 application = get_asgi_application()
+
+# Warm the in-process username index off the request path (see memes/typeahead.py)
+from memes.typeahead import typeahead
+
+typeahead.start()
@@ -0,0 +1,130 @@
+import hashlib
+from collections import namedtuple
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Resized, re-encoded renditions of uploaded images. Each model lists the
+# variants it wants; the storage names of the generated files are kept in a
+# JSON field next to the original ({'feed': 'memes/variants/x_feed.jpg'}),
+# and templates ask the model for the URL of the size they display, which
+# falls back to the original whenever a variant is missing. Animated images
+# and anything Pillow cannot decode are left with no variants.
+Variant = namedtuple('Variant', 'width square format')
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+QUALITY = {'JPEG': 82, 'WEBP': 80}
+HASH_SIZE = 8  # perceptual hashes are HASH_SIZE x HASH_SIZE bits
+
+
+def _open(field_file):
+    try:
+        field_file.open('rb')
+        image = Image.open(field_file)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        field_file.close()
+    if getattr(image, 'is_animated', False):
+        return None
+    return ImageOps.exif_transpose(image)
+
+
+def _encode(image, variant):
+    if variant.square:
+        image = ImageOps.fit(image, (variant.width, variant.width), Image.LANCZOS)
+    else:
+        image = image.copy()
+        # Bound the width only (thumbnail never upscales); very tall images keep their shape
+        image.thumbnail((variant.width, variant.width * 10), Image.LANCZOS)
+    if variant.format == 'JPEG' and image.mode != 'RGB':
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, 'white')
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, variant.format, quality=QUALITY[variant.format], optimize=True)
+    return buffer.getvalue()
+
+
+def render_variants(field_file, variants):
+    """Write every variant of `field_file` next to it. Returns {name: storage name}."""
+    image = _open(field_file)
+    if image is None:
+        return {}
+    original = PurePosixPath(field_file.name)
+    names = {}
+    for name, variant in variants.items():
+        target = original.parent / 'variants' / f'{original.stem}_{name}.{EXTENSIONS[variant.format]}'
+        names[name] = field_file.storage.save(str(target), ContentFile(_encode(image, variant)))
+    return names
+
+
+def refresh_variants(instance, image_field, variants_field, variants):
+    """Regenerate an instance's variants after its image changed, removing the old files."""
+    field_file = getattr(instance, image_field)
+    old = getattr(instance, variants_field) or {}
+    new = render_variants(field_file, variants) if field_file else {}
+    # Exact duplicate uploads share the original and its variants (see memes/duplicates.py)
+    shared = field_file and type(instance)._default_manager.filter(
+        **{image_field: field_file.name}
+    ).exclude(pk=instance.pk).exists()
+    if not shared:
+        for name in set(old.values()) - set(new.values()):
+            field_file.storage.delete(name)
+    setattr(instance, variants_field, new)
+    instance.save(update_fields=[variants_field])
+    return new
+
+
+def variant_url(field_file, variants, name, fallback=True):
+    """URL of one variant, else the original's (or None when fallback is off)."""
+    if name in variants:
+        return field_file.storage.url(variants[name])
+    if fallback and field_file:
+        return field_file.url
+    return None
+
+
+def content_hash(file):
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _bits_to_hex(bits):
+    return f'{int("".join("1" if bit else "0" for bit in bits), 2):0{HASH_SIZE * HASH_SIZE // 4}x}'
+
+
+def perceptual_hashes(file):
+    """
+    (aHash, dHash) of an image as hex strings, or ('', '') if it cannot be
+    decoded. aHash marks pixels brighter than the mean of an 8x8 greyscale
+    thumbnail, dHash whether each pixel is darker than its right-hand
+    neighbour in a 9x8 one; re-encoded or resized copies differ by a few bits.
+    """
+    try:
+        file.seek(0)
+        image = Image.open(file)
+        # JPEGs decode straight at a fraction of their size, which is all a hash needs
+        image.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        grey = ImageOps.exif_transpose(image).convert('L')
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return '', ''
+    finally:
+        file.seek(0)
+    pixels = grey.resize((HASH_SIZE, HASH_SIZE), Image.LANCZOS).tobytes()
+    mean = sum(pixels) / len(pixels)
+    ahash = _bits_to_hex(pixel > mean for pixel in pixels)
+    rows = grey.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).tobytes()
+    dhash = _bits_to_hex(
+        rows[y * (HASH_SIZE + 1) + x] < rows[y * (HASH_SIZE + 1) + x + 1]
+        for y in range(HASH_SIZE) for x in range(HASH_SIZE)
+    )
+    return ahash, dhash
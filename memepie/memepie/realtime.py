@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Per-user push events (new messages, notifications, unread badges) for the
+# /events/ stream. Producers call publish() from ordinary sync code; the
+# configured backend hands events to whichever stream subscriptions are open.
+# The default backend only reaches streams served by the same process; a
+# multi-process deployment points REALTIME_BACKEND at a shared pub/sub
+# implementing the same two methods.
+
+
+class Subscription:
+    """One open stream: an asyncio queue bound to the loop that reads it."""
+
+    def __init__(self, backend, channel):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.REALTIME_QUEUE_SIZE)
+
+    def deliver(self, event):
+        def put():
+            if not self.queue.full():
+                self.queue.put_nowait(event)
+        self.loop.call_soon_threadsafe(put)
+
+    async def get(self, timeout):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InProcessBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._subscriptions.get(subscription.channel, set())
+            listeners.discard(subscription)
+            if not listeners:
+                self._subscriptions.pop(subscription.channel, None)
+
+    def publish(self, channel, event):
+        with self._lock:
+            listeners = list(self._subscriptions.get(channel, ()))
+        for subscription in listeners:
+            subscription.deliver(event)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.REALTIME_BACKEND)()
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def publish(user_ids, event_type, data):
+    """Push an event to every open stream of the given users once the current transaction commits."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def send():
+        backend = get_backend()
+        for user_id in user_ids:
+            backend.publish(user_channel(user_id), {'type': event_type, 'data': data})
+
+    transaction.on_commit(send)
+
+
+def publish_unread_counts(user_ids):
+    from .unread import unread_counts
+    user_ids = list(user_ids)
+
+    def send():
+        for user_id in user_ids:
+            get_backend().publish(user_channel(user_id), {'type': 'unread', 'data': unread_counts(user_id)})
+
+    transaction.on_commit(send)
@@ -95,6 +95,15 @@ DATABASES = {
 }
 
 
+# Cache
+# Defaults to an in-process cache; point CACHE_URL at redis/memcached in production,
+# or use e.g. filecache:///tmp/memepie-cache for a persistent offline cache.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://memepie'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -145,3 +154,65 @@ CSRF_COOKIE_SECURE = env.bool('CSRF_COOKIE_SECURE', default=False)
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 LOGIN_URL = 'login'
+
+# Feed
+FEED_PAGE_SIZE = env.int('FEED_PAGE_SIZE', default=10)
+NOTIFICATIONS_PAGE_SIZE = env.int('NOTIFICATIONS_PAGE_SIZE', default=20)
+CHAT_PAGE_SIZE = env.int('CHAT_PAGE_SIZE', default=30)
+SEARCH_PAGE_SIZE = env.int('SEARCH_PAGE_SIZE', default=20)
+PROFILE_PAGE_SIZE = env.int('PROFILE_PAGE_SIZE', default=10)
+
+# Username typeahead: per-process index rebuilt this often, matches ranked per lookup, results returned
+TYPEAHEAD_REFRESH_SECONDS = env.int('TYPEAHEAD_REFRESH_SECONDS', default=300)
+TYPEAHEAD_SCAN_LIMIT = env.int('TYPEAHEAD_SCAN_LIMIT', default=200)
+TYPEAHEAD_LIMIT = env.int('TYPEAHEAD_LIMIT', default=8)
+SHARE_MAX_RECIPIENTS = env.int('SHARE_MAX_RECIPIENTS', default=50)
+
+# Timeline fan-out: authors with more followers than this are fanned out in the background
+TIMELINE_FANOUT_SYNC_LIMIT = env.int('TIMELINE_FANOUT_SYNC_LIMIT', default=500)
+TIMELINE_BACKFILL_SIZE = env.int('TIMELINE_BACKFILL_SIZE', default=200)
+TIMELINE_BATCH_SIZE = 1000
+
+# Per-user feed/suggestion cache lifetimes (seconds); entries are also invalidated by signals
+FEED_CACHE_TTL = env.int('FEED_CACHE_TTL', default=60)
+SUGGESTIONS_CACHE_TTL = env.int('SUGGESTIONS_CACHE_TTL', default=300)
+THREAD_SUMMARY_CACHE_TTL = env.int('THREAD_SUMMARY_CACHE_TTL', default=300)
+
+# Precomputed suggestions: rows kept per user and users scored per matrix batch
+SUGGESTIONS_TOP_K = env.int('SUGGESTIONS_TOP_K', default=50)
+SUGGESTIONS_BATCH_SIZE = env.int('SUGGESTIONS_BATCH_SIZE', default=1000)
+
+# Rendered logged-out home feed; also replaced whenever an upload, like or comment bumps the content version
+ANON_HOME_CACHE_TTL = env.int('ANON_HOME_CACHE_TTL', default=300)
+
+# Like buffer: clicks are collapsed in memory and written in bulk this many seconds
+# after the first one (0 writes every click straight through), or once this many are pending
+LIKE_BUFFER_FLUSH_INTERVAL = env.float('LIKE_BUFFER_FLUSH_INTERVAL', default=1.0)
+LIKE_BUFFER_MAX_PENDING = env.int('LIKE_BUFFER_MAX_PENDING', default=500)
+
+# Media queue (see memes/media_jobs.py): process_media pool size and poll interval, retries with
+# exponential backoff, and how long a job may stay claimed before another worker takes it over.
+# MEDIA_JOBS_EAGER runs each job inside the upload request instead; it is on by default with
+# DEBUG so runserver works without a worker, and should be off wherever process_media runs.
+MEDIA_WORKERS = env.int('MEDIA_WORKERS', default=2)
+MEDIA_JOB_POLL_SECONDS = env.float('MEDIA_JOB_POLL_SECONDS', default=1.0)
+MEDIA_JOB_MAX_ATTEMPTS = env.int('MEDIA_JOB_MAX_ATTEMPTS', default=5)
+MEDIA_JOB_RETRY_SECONDS = env.int('MEDIA_JOB_RETRY_SECONDS', default=30)
+MEDIA_JOB_TIMEOUT = env.int('MEDIA_JOB_TIMEOUT', default=600)
+MEDIA_JOBS_EAGER = env.bool('MEDIA_JOBS_EAGER', default=DEBUG)
+
+# Uploads whose dHash is within this many bits of an existing meme are flagged as near duplicates
+# (lookups are exact up to 3, see memes/duplicates.py)
+NEAR_DUPLICATE_DISTANCE = env.int('NEAR_DUPLICATE_DISTANCE', default=3)
+
+# Cached unread badges; writers keep them current and reconcile_unread_counts rewrites them
+UNREAD_COUNTS_TTL = env.int('UNREAD_COUNTS_TTL', default=86400)
+
+# Push events (/events/, see realtime.py). The default backend only reaches streams held by the
+# same process; point REALTIME_BACKEND at a shared pub/sub when running several workers.
+REALTIME_BACKEND = env('REALTIME_BACKEND', default='memepie.realtime.InProcessBackend')
+REALTIME_QUEUE_SIZE = 100
+REALTIME_KEEPALIVE_SECONDS = env.int('REALTIME_KEEPALIVE_SECONDS', default=15)
+# How long browsers wait before reconnecting; under WSGI every reconnect is a one-shot poll
+REALTIME_RETRY_MS = env.int('REALTIME_RETRY_MS', default=3000)
+REALTIME_FALLBACK_RETRY_MS = env.int('REALTIME_FALLBACK_RETRY_MS', default=60000)
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+
+# Per-user unread badges for the base layout. The cache holds the numbers;
+# writers adjust them in place, and a missing key is recounted from the
+# database on the next read. `reconcile_unread_counts` rewrites them all
+# periodically so any drift is short-lived.
+MESSAGES = 'messages'
+NOTIFICATIONS = 'notifications'
+KINDS = (MESSAGES, NOTIFICATIONS)
+
+
+def _key(kind, user_id):
+    return f'unread:{kind}:{user_id}'
+
+
+def count_unread_messages(user_id):
+    from direct_messages.models import ThreadParticipant
+    return ThreadParticipant.objects.filter(user_id=user_id).aggregate(total=Sum('unread_count'))['total'] or 0
+
+
+def count_unread_notifications(user_id):
+    from memes.notifications import unread_count
+    return unread_count(user_id)
+
+
+COUNTERS = {
+    MESSAGES: count_unread_messages,
+    NOTIFICATIONS: count_unread_notifications,
+}
+
+
+def unread_counts(user_id):
+    """Return {'messages': n, 'notifications': n}, from the cache when it has them."""
+    keys = {kind: _key(kind, user_id) for kind in KINDS}
+    cached = cache.get_many(keys.values())
+    counts = {}
+    for kind, key in keys.items():
+        if key in cached:
+            counts[kind] = max(cached[key], 0)
+        else:
+            counts[kind] = COUNTERS[kind](user_id)
+            cache.set(key, counts[kind], settings.UNREAD_COUNTS_TTL)
+    return counts
+
+
+def adjust(kind, user_ids, delta):
+    """Add `delta` to cached counters; users without one are recounted on their next read."""
+    if not delta:
+        return
+    for user_id in user_ids:
+        key = _key(kind, user_id)
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+
+
+def reset(kind, user_id, value=0):
+    cache.set(_key(kind, user_id), value, settings.UNREAD_COUNTS_TTL)
+
+
+def forget(kind, user_ids):
+    cache.delete_many([_key(kind, user_id) for user_id in user_ids])
+
+
+def reconcile(batch_size=1000):
+    """Recount every user's badges from the database and overwrite the cache. Returns users processed."""
+    from django.contrib.auth.models import User
+    from direct_messages.models import ThreadParticipant
+    from memes.models import Notification, NotificationWatermark
+
+    processed = 0
+    last_id = 0
+    while True:
+        user_ids = list(User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not user_ids:
+            return processed
+
+        messages = dict(
+            ThreadParticipant.objects.filter(user_id__in=user_ids)
+            .order_by().values_list('user_id').annotate(total=Sum('unread_count'))
+        )
+        seen_at = NotificationWatermark.objects.filter(user_id=OuterRef('recipient_id')).values('seen_at')
+        notifications = dict(
+            Notification.objects.filter(recipient_id__in=user_ids)
+            .annotate(seen_at=Subquery(seen_at))
+            .filter(Q(seen_at__isnull=True) | Q(updated_at__gt=F('seen_at')))
+            .order_by().values_list('recipient_id').annotate(total=Count('id'))
+        )
+        values = {}
+        for user_id in user_ids:
+            values[_key(MESSAGES, user_id)] = messages.get(user_id, 0)
+            values[_key(NOTIFICATIONS, user_id)] = notifications.get(user_id, 0)
+        cache.set_many(values, settings.UNREAD_COUNTS_TTL)
+
+        processed += len(user_ids)
+        last_id = user_ids[-1]
@@ -18,11 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('messages/', include('direct_messages.urls')),
+    path('events/', views.event_stream, name='event_stream'),
     path('', include('memes.urls')),
 ]
 
@@ -0,0 +1,52 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .realtime import get_backend, user_channel
+from .unread import unread_counts
+
+
+def _sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events for the signed-in user: an `unread` snapshot first, then
+    `message`, `read`, `notification` and `unread` events as they happen, with
+    comment keep-alives in between. Outside ASGI a request cannot be held open, so the
+    snapshot is sent on its own and the browser reconnects after `retry`.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    if not isinstance(request, ASGIRequest):
+        counts = await sync_to_async(unread_counts)(user.id)
+        retry = f"retry: {settings.REALTIME_FALLBACK_RETRY_MS}\n\n"
+        response = HttpResponse(retry + _sse('unread', counts), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    async def stream():
+        # Subscribe before taking the snapshot so nothing falls in between
+        subscription = get_backend().subscribe(user_channel(user.id))
+        try:
+            counts = await sync_to_async(unread_counts)(user.id)
+            yield f"retry: {settings.REALTIME_RETRY_MS}\n\n" + _sse('unread', counts)
+            while True:
+                event = await subscription.get(settings.REALTIME_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield _sse(event['type'], event['data'])
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -15,5 +15,5 @@ class CommentAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('recipient', 'sender', 'notification_type', 'created_at', 'is_read')
-    list_filter = ('notification_type', 'is_read', 'created_at')
+    list_display = ('recipient', 'sender', 'notification_type', 'actor_count', 'updated_at')
+    list_filter = ('notification_type', 'updated_at')
@@ -0,0 +1,94 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Meme, Comment
+from .ranking import refresh_hot_scores
+
+
+def adjust_counter(model, ids, field, delta):
+    """Atomically add `delta` to a counter column on the given rows (never below zero)."""
+    if not ids or not delta:
+        return
+    model.objects.filter(pk__in=ids).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def sync_like_counter(model, through, owner_field, instance, action, reverse, pk_set):
+    """
+    Keep `likes_count` in step with an m2m like relation (Meme.faa_likes or
+    Comment.likes) from its m2m_changed signal. Handles both sides of the
+    relation: `reverse` means the instance is the user and pk_set holds the
+    liked objects.
+    """
+    touched = []
+    if action == 'post_add' and pk_set:
+        # Django only reports ids that were actually inserted for post_add
+        if reverse:
+            touched = list(pk_set)
+            adjust_counter(model, touched, 'likes_count', 1)
+        else:
+            touched = [instance.pk]
+            adjust_counter(model, touched, 'likes_count', len(pk_set))
+    elif action == 'pre_remove' and pk_set:
+        # pk_set for removals is whatever was requested, so count what really exists
+        if reverse:
+            touched = list(through.objects.filter(
+                user_id=instance.pk, **{f'{owner_field}__in': pk_set}
+            ).values_list(owner_field, flat=True))
+            adjust_counter(model, touched, 'likes_count', -1)
+        else:
+            touched = [instance.pk]
+            removed = through.objects.filter(**{owner_field: instance.pk}, user_id__in=pk_set).count()
+            adjust_counter(model, touched, 'likes_count', -removed)
+    elif action == 'pre_clear':
+        if reverse:
+            touched = list(through.objects.filter(user_id=instance.pk).values_list(owner_field, flat=True))
+            adjust_counter(model, touched, 'likes_count', -1)
+        else:
+            touched = [instance.pk]
+            model.objects.filter(pk=instance.pk).update(likes_count=0)
+
+    if model is Meme and touched:
+        refresh_hot_scores(touched)
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        instance.refresh_from_db(fields=['likes_count'])
+
+
+def sync_comment_counters(comment, delta):
+    adjust_counter(Meme, [comment.meme_id], 'comments_count', delta)
+    refresh_hot_scores([comment.meme_id])
+    if comment.parent_id:
+        adjust_counter(Comment, [comment.parent_id], 'replies_count', delta)
+
+
+def _count_subquery(queryset, outer_field):
+    counts = queryset.filter(**{outer_field: OuterRef('pk')}).order_by().values(outer_field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def counter_specs():
+    return [
+        (Meme, 'likes_count', Meme.faa_likes.through.objects.all(), 'meme_id'),
+        (Meme, 'comments_count', Comment.objects.all(), 'meme_id'),
+        (Comment, 'likes_count', Comment.likes.through.objects.all(), 'comment_id'),
+        (Comment, 'replies_count', Comment.objects.all(), 'parent_id'),
+    ]
+
+
+def repair_counters(batch_size=1000):
+    """
+    Recompute every denormalized counter from the source tables and rewrite
+    only the rows that drifted. Returns {'Model.field': rows_repaired}.
+    """
+    repaired = {}
+    for model, field, source, outer_field in counter_specs():
+        drifted = (
+            model.objects.annotate(actual=_count_subquery(source, outer_field))
+            .exclude(**{field: F('actual')})
+            .values_list('pk', 'actual')
+        )
+        fixes = [model(pk=pk, **{field: actual}) for pk, actual in drifted]
+        model.objects.bulk_update(fixes, [field], batch_size=batch_size)
+        repaired[f'{model.__name__}.{field}'] = len(fixes)
+        if model is Meme and fixes:
+            refresh_hot_scores([fix.pk for fix in fixes])
+    return repaired
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db.models import Q
+
+from memepie.images import content_hash, perceptual_hashes
+from .models import Meme, MemeHashBand
+
+# Duplicate detection for uploads. Every meme stores the SHA-256 of its file
+# and its aHash/dHash (memepie/images.py). Byte-identical uploads reuse the
+# stored file, and its variants once processed, instead of keeping another
+# copy. Near duplicates (re-encoded, resized, lightly edited) are found through
+# MemeHashBand: the 64-bit dHash is cut into BANDS slices, each indexed, and
+# two hashes within BANDS - 1 bits of each other must agree on at least one
+# whole slice. So a lookup is a handful of indexed equality matches followed
+# by an exact Hamming distance check on the few candidates.
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def bands(dhash):
+    value = int(dhash, 16)
+    mask = (1 << BAND_BITS) - 1
+    return [(band, (value >> (band * BAND_BITS)) & mask) for band in range(BANDS)]
+
+
+def index_hash(meme):
+    """Rewrite a meme's hash bands after its dHash changed."""
+    MemeHashBand.objects.filter(meme=meme).delete()
+    if meme.image_dhash:
+        MemeHashBand.objects.bulk_create(
+            MemeHashBand(meme=meme, band=band, value=value) for band, value in bands(meme.image_dhash)
+        )
+
+
+def find_near_duplicate(dhash, before_id=None):
+    """
+    The meme whose dHash is closest to `dhash`, if it is within
+    NEAR_DUPLICATE_DISTANCE bits (ties go to the oldest), else None. With
+    `before_id`, only memes older than that one are considered.
+    """
+    if not dhash:
+        return None
+    match = Q()
+    for band, value in bands(dhash):
+        match |= Q(band=band, value=value)
+    candidates = Meme.objects.filter(id__in=MemeHashBand.objects.filter(match).values('meme_id'))
+    if before_id is not None:
+        candidates = candidates.filter(id__lt=before_id)
+    best = None
+    for meme_id, other in candidates.values_list('id', 'image_dhash'):
+        distance = hamming(dhash, other)
+        if distance <= settings.NEAR_DUPLICATE_DISTANCE and (best is None or (distance, meme_id) < best):
+            best = (distance, meme_id)
+    return Meme.objects.filter(id=best[1]).first() if best else None
+
+
+def fingerprint(meme):
+    """Fill in the hash fields of a meme from its image file."""
+    meme.image_sha256 = content_hash(meme.image)
+    meme.image_ahash, meme.image_dhash = perceptual_hashes(meme.image)
+
+
+def fingerprint_upload(meme):
+    """
+    Hash a new, not yet saved upload. A byte-identical copy of an existing
+    meme takes over that meme's stored file, and its variants when they are
+    ready; otherwise near_duplicate_of points at the closest perceptual match.
+    Returns True when the media was reused as is and needs no processing.
+    """
+    fingerprint(meme)
+    original = Meme.objects.filter(image_sha256=meme.image_sha256).order_by('id').first()
+    if original is None:
+        meme.near_duplicate_of = find_near_duplicate(meme.image_dhash)
+        return False
+    meme.near_duplicate_of = original
+    meme.image = original.image.name
+    if original.media_status != 'ready':
+        return False
+    meme.image_variants = dict(original.image_variants)
+    meme.media_status = 'ready'
+    return True
@@ -0,0 +1,108 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(tier, key=None):
+    payload = {'t': tier, 'k': key}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0, None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        tier, key = payload['t'], payload.get('k')
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor(cursor)
+    # Only the shapes encode_cursor produces: a tier number and a flat list of key values
+    if not isinstance(tier, int) or isinstance(tier, bool) or tier < 0:
+        raise InvalidCursor(cursor)
+    if key is not None and not (
+        isinstance(key, list) and key
+        and all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in key)
+    ):
+        raise InvalidCursor(cursor)
+    return tier, key
+
+
+def _key_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse_key_value(field, value):
+    if field.endswith('_at'):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def keyset_filter(fields, key):
+    """
+    Build the "strictly after `key`" condition for a descending ordering on
+    `fields`, e.g. (a < x) OR (a = x AND b < y) OR (a = x AND b = y AND c < z).
+    """
+    if len(key) != len(fields):
+        raise InvalidCursor(key)
+    try:
+        values = [_parse_key_value(field, value) for field, value in zip(fields, key)]
+    except (ValueError, TypeError):
+        raise InvalidCursor(key)
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__lt': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return condition
+
+
+def paginate_tiers(tiers, cursor=None, page_size=10):
+    """
+    Walk a list of (queryset, ordering_fields) tiers in priority order and
+    return one page of results plus an opaque cursor for the next page.
+
+    Every ordering must be descending and end with a unique field (the id) so
+    that the keyset position is unambiguous. Returns (items, next_cursor);
+    next_cursor is None once every tier is exhausted.
+    """
+    tier_index, key = decode_cursor(cursor)
+    if cursor and tier_index >= len(tiers):
+        raise InvalidCursor(cursor)
+    page = []
+
+    while tier_index < len(tiers) and len(page) < page_size:
+        queryset, fields = tiers[tier_index]
+        if key is not None:
+            try:
+                queryset = queryset.filter(keyset_filter(fields, key))
+            except (ValueError, TypeError):
+                # A key value the field cannot take, e.g. text where hot_score expects a number
+                raise InvalidCursor(cursor)
+        queryset = queryset.order_by(*[f'-{field}' for field in fields])
+
+        remaining = page_size - len(page)
+        batch = list(queryset[:remaining + 1])
+        if len(batch) > remaining:
+            page.extend(batch[:remaining])
+            last = batch[remaining - 1]
+            next_key = [_key_value(getattr(last, field)) for field in fields]
+            return page, encode_cursor(tier_index, next_key)
+
+        page.extend(batch)
+        tier_index += 1
+        key = None
+
+    if tier_index < len(tiers):
+        return page, encode_cursor(tier_index)
+    return page, None
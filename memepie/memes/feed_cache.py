@@ -0,0 +1,130 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Meme
+
+# Keys embed a per-user version token. Changing it orphans every entry built
+# with the old one, so invalidation never has to find or delete individual
+# keys. Tokens are random rather than counters so a version can never be
+# handed out twice. A new meme bumps its author and their followers (the
+# timeline fan-out does this once the entries exist); everyone else only
+# meets it in the fallback tier and picks it up when their entry expires
+# after FEED_CACHE_TTL, so uploads do not flush every reader's cache.
+CONTENT_VERSION_KEY = 'feedcache:content'
+STATS_KEY = 'feedcache:stats:{name}:{outcome}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def _version(key):
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, _new_token(), None)
+        token = cache.get(key)
+    return token
+
+
+def user_version(user_id):
+    return _version(f'feedcache:user:{user_id}')
+
+
+def bump_user_version(user_id):
+    cache.set(f'feedcache:user:{user_id}', _new_token(), None)
+
+
+def bump_user_versions(user_ids):
+    cache.set_many({f'feedcache:user:{user_id}': _new_token() for user_id in user_ids}, None)
+
+
+def content_version():
+    """
+    Global (token, last_modified) pair for everything an anonymous visitor
+    sees: bumped by uploads, likes and comments.
+    """
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(CONTENT_VERSION_KEY, (_new_token(), timezone.now().replace(microsecond=0)), None)
+        version = cache.get(CONTENT_VERSION_KEY)
+    return version
+
+
+def bump_content_version():
+    cache.set(CONTENT_VERSION_KEY, (_new_token(), timezone.now().replace(microsecond=0)), None)
+
+
+def _record(name, outcome):
+    key = STATS_KEY.format(name=name, outcome=outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def cache_stats():
+    """Return {'feed': {'hit': n, 'miss': n}, 'suggestions': {...}, ...} since the cache was last cleared."""
+    return {
+        name: {outcome: cache.get(STATS_KEY.format(name=name, outcome=outcome), 0) for outcome in ('hit', 'miss')}
+        for name in ('feed', 'suggestions', 'anonhome')
+    }
+
+
+def _get_or_compute(name, user_id, parts, ttl, compute):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    key = f'feedcache:{name}:{user_id}:{user_version(user_id)}:{digest}'
+    value = cache.get(key)
+    if value is not None:
+        _record(name, 'hit')
+        return value
+    _record(name, 'miss')
+    value = compute()
+    cache.set(key, value, ttl)
+    return value
+
+
+def cached_feed_page(user, cursor, page_size, build_page):
+    """
+    Cache one feed page as (meme ids, next cursor). `build_page` is the
+    uncached builder returning (memes, next_cursor).
+    """
+    def compute():
+        memes, next_cursor = build_page(user, cursor, page_size)
+        return [meme.id for meme in memes], next_cursor
+
+    ids, next_cursor = _get_or_compute('feed', user.id, (cursor, page_size), settings.FEED_CACHE_TTL, compute)
+    memes = Meme.objects.in_bulk(ids)
+    return [memes[meme_id] for meme_id in ids if meme_id in memes], next_cursor
+
+
+def cached_suggestions(user, limit, build_suggestions):
+    def compute():
+        return [suggested.id for suggested in build_suggestions(user, limit)]
+
+    ids = _get_or_compute('suggestions', user.id, (limit,), settings.SUGGESTIONS_CACHE_TTL, compute)
+    users = User.objects.select_related('profile').in_bulk(ids)
+    return [users[user_id] for user_id in ids if user_id in users]
+
+
+def cached_anonymous_feed(render_page):
+    """
+    Cache the rendered first page of the logged-out home feed as
+    (html, next_cursor) under the current content version. `render_page` is
+    the uncached renderer returning the same pair.
+    """
+    token, _ = content_version()
+    key = f'feedcache:anonhome:{token}'
+    value = cache.get(key)
+    if value is not None:
+        _record('anonhome', 'hit')
+        return value
+    _record('anonhome', 'miss')
+    value = render_page()
+    cache.set(key, value, settings.ANON_HOME_CACHE_TTL)
+    return value
@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+
+from .models import Meme, Comment
+
+
+def hydrate_authors(memes):
+    """Attach authors (with profiles) to a page of memes in one query."""
+    author_ids = {meme.author_id for meme in memes}
+    authors = User.objects.select_related('profile').in_bulk(author_ids)
+    for meme in memes:
+        meme.author = authors[meme.author_id]
+    return memes
+
+
+def hydrate_memes(memes, viewer):
+    """
+    Batch-load everything a post card renders for a whole page of memes:
+    authors and profiles, the comment tree with reply authors, and whether
+    `viewer` liked each meme or comment. Like and comment totals come from
+    the stored counters. The number of queries is fixed regardless of page
+    size.
+
+    Sets on each meme: viewer_liked and comment_thread (top-level comments,
+    each with reply_list). Comments get viewer_liked.
+    """
+    memes = list(memes)
+    if not memes:
+        return memes
+    meme_ids = [meme.id for meme in memes]
+    viewer_id = viewer.id if viewer.is_authenticated else None
+
+    hydrate_authors(memes)
+
+    liked_meme_ids = set()
+    if viewer_id:
+        liked_meme_ids = set(
+            Meme.faa_likes.through.objects.filter(meme_id__in=meme_ids, user_id=viewer_id).values_list('meme_id', flat=True)
+        )
+
+    comments = list(
+        Comment.objects.filter(meme_id__in=meme_ids)
+        .select_related('author__profile')
+        .order_by('created_at', 'id')
+    )
+    liked_comment_ids = set()
+    if viewer_id and comments:
+        liked_comment_ids = set(
+            Comment.likes.through.objects.filter(
+                comment_id__in=[c.id for c in comments], user_id=viewer_id
+            ).values_list('comment_id', flat=True)
+        )
+
+    top_level = defaultdict(list)
+    replies = defaultdict(list)
+    for comment in comments:
+        comment.viewer_liked = comment.id in liked_comment_ids
+        if comment.parent_id:
+            replies[comment.parent_id].append(comment)
+        else:
+            top_level[comment.meme_id].append(comment)
+    for comment in comments:
+        comment.reply_list = replies[comment.id]
+
+    for meme in memes:
+        meme.viewer_liked = meme.id in liked_meme_ids
+        meme.comment_thread = top_level[meme.id]
+    return memes
@@ -0,0 +1,163 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .models import Meme
+from .notifications import Event, notify
+
+logger = logging.getLogger(__name__)
+
+class LikeBuffer:
+    """
+    In-process write buffer for meme likes. Clicks only flip an entry in
+    memory; a flush collapses every pending toggle per (user, meme) into its
+    net effect and writes each meme's changes with one faa_likes.add() and one
+    faa_likes.remove() (so the usual m2m_changed receivers run once per meme
+    rather than once per click), plus one batched notify().
+
+    A flush happens LIKE_BUFFER_FLUSH_INTERVAL seconds after the first
+    buffered click, as soon as LIKE_BUFFER_MAX_PENDING pairs are waiting, and
+    at interpreter exit. An interval of 0 writes every click straight through.
+    A batch whose write fails is logged and put back to be retried by the
+    next flush.
+
+    The buffer belongs to one process. With several workers, a toggle that
+    lands on a different worker than the user's earlier, unflushed click
+    starts from the database state, so the two can disagree until both
+    flush (and optimistic counts only include this process's clicks).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # (user_id, meme_id) -> [liked_in_db, liked_now]
+        self._in_flight = {}
+        self._timer = None
+
+    def _current_state(self, key):
+        for entries in (self._pending, self._in_flight):
+            if key in entries:
+                return entries[key][1]
+        return None
+
+    def toggle(self, user_id, meme_id):
+        """Flip the user's like on a meme. Returns True if the meme is now liked."""
+        key = (user_id, meme_id)
+        with self._lock:
+            liked = self._current_state(key)
+        if liked is None:
+            liked = Meme.faa_likes.through.objects.filter(user_id=user_id, meme_id=meme_id).exists()
+
+        with self._lock:
+            entry = self._pending.setdefault(key, [liked, liked])
+            entry[1] = not entry[1]
+            liked_now = entry[1]
+            if entry[0] == entry[1]:
+                # Toggled back: nothing to write, and the database is right again
+                del self._pending[key]
+            flush_now = settings.LIKE_BUFFER_FLUSH_INTERVAL <= 0 or len(self._pending) >= settings.LIKE_BUFFER_MAX_PENDING
+            if not flush_now:
+                self._schedule(settings.LIKE_BUFFER_FLUSH_INTERVAL)
+        if flush_now:
+            self.flush()
+        return liked_now
+
+    def _schedule(self, delay):
+        # Caller holds the lock
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _requeue(self, batch):
+        # Caller holds the lock. Clicks made while the batch was in flight
+        # started from its unwritten state, so give them the real one back.
+        for key, (was, now) in batch.items():
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [was, now]
+            elif was == entry[1]:
+                del self._pending[key]
+            else:
+                entry[0] = was
+        if self._pending:
+            self._schedule(max(settings.LIKE_BUFFER_FLUSH_INTERVAL, 1.0))
+
+    def pending_delta(self, meme_id):
+        """Net like count change for a meme that has not been written yet."""
+        with self._lock:
+            return sum(
+                now - was
+                for entries in (self._pending, self._in_flight)
+                for (_, pending_meme_id), (was, now) in entries.items()
+                if pending_meme_id == meme_id
+            )
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write all pending likes. Returns the number of (user, meme) pairs changed."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch = self._pending
+            self._in_flight.update(batch)
+            self._pending = {}
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                self._write(batch)
+        except Exception:
+            logger.exception("Writing %d buffered like(s) failed; keeping them for the next flush", len(batch))
+            with self._lock:
+                for key in batch:
+                    self._in_flight.pop(key, None)
+                self._requeue(batch)
+            return 0
+        with self._lock:
+            for key in batch:
+                self._in_flight.pop(key, None)
+        return len(batch)
+
+    def _write(self, batch):
+        added, removed = defaultdict(list), defaultdict(list)
+        for (user_id, meme_id), (_, liked) in batch.items():
+            (added if liked else removed)[meme_id].append(user_id)
+
+        memes = Meme.objects.in_bulk(set(added) | set(removed))
+        for meme_id, user_ids in removed.items():
+            if meme_id in memes:
+                memes[meme_id].faa_likes.remove(*user_ids)
+        for meme_id, user_ids in added.items():
+            if meme_id in memes:
+                memes[meme_id].faa_likes.add(*user_ids)
+
+        usernames = dict(User.objects.filter(id__in={u for ids in added.values() for u in ids}).values_list('id', 'username'))
+        notify([
+            Event(memes[meme_id].author_id, user_id, 'like', meme_id, f"{usernames[user_id]} liked your meme")
+            for meme_id, user_ids in added.items() if meme_id in memes
+            for user_id in user_ids if user_id in usernames
+        ])
+
+
+like_buffer = LikeBuffer()
+atexit.register(like_buffer.flush)
+
+
+def toggle_like(user, meme):
+    """Buffer a like toggle and return (liked, optimistic like count)."""
+    liked = like_buffer.toggle(user.id, meme.id)
+    if settings.LIKE_BUFFER_FLUSH_INTERVAL <= 0:
+        meme.refresh_from_db(fields=['likes_count'])
+        return liked, meme.likes_count
+    return liked, max(meme.likes_count + like_buffer.pending_delta(meme.id), 0)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from memes.duplicates import find_near_duplicate, fingerprint
+from memes.models import Meme
+
+
+class Command(BaseCommand):
+    help = "Compute content and perceptual hashes for memes uploaded before they existed, and flag near duplicates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute hashes that already exist too.")
+
+    def handle(self, *args, **options):
+        memes = Meme.objects.order_by('id')
+        if not options['all']:
+            memes = memes.filter(image_sha256='')
+
+        hashed = flagged = 0
+        for meme in memes.iterator():
+            try:
+                fingerprint(meme)
+            except OSError as exc:
+                self.stderr.write(f"Skipping meme {meme.pk}: {exc}")
+                continue
+            finally:
+                meme.image.close()
+            # Only earlier memes count as originals, so the first upload is never flagged as the copy
+            if meme.near_duplicate_of_id is None:
+                meme.near_duplicate_of = find_near_duplicate(meme.image_dhash, before_id=meme.pk)
+                flagged += meme.near_duplicate_of is not None
+            meme.save(update_fields=['image_sha256', 'image_ahash', 'image_dhash', 'near_duplicate_of'])
+            hashed += 1
+        self.stdout.write(self.style.SUCCESS(f"Hashed {hashed} meme(s), {flagged} flagged as near duplicates."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile, PROFILE_PIC_VARIANTS
+from memepie.images import refresh_variants
+from memes.models import Meme, MEME_IMAGE_VARIANTS
+
+
+class Command(BaseCommand):
+    help = "Generate the resized image variants for memes and profile pictures uploaded before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerate variants that already exist too.")
+
+    def handle(self, *args, **options):
+        memes = Meme.objects.all()
+        profiles = Profile.objects.exclude(profile_pic=Profile._meta.get_field('profile_pic').default)
+        if not options['all']:
+            memes = memes.filter(image_variants={})
+            profiles = profiles.filter(profile_pic_variants={})
+
+        built = 0
+        for meme in memes.iterator():
+            built += bool(refresh_variants(meme, 'image', 'image_variants', MEME_IMAGE_VARIANTS))
+        for profile in profiles.iterator():
+            built += bool(refresh_variants(profile, 'profile_pic', 'profile_pic_variants', PROFILE_PIC_VARIANTS))
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {built} image(s)."))
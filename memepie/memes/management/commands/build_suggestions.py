@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from memes.suggestions import build_suggestions
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed follow suggestions for every user (run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        written = build_suggestions(top_k=options['top_k'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} suggestion(s)."))
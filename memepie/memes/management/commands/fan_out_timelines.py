@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from memes.timeline import fan_out_pending
+
+
+class Command(BaseCommand):
+    help = "Finish large-audience timeline fan-outs that a restarted process left unwritten (run every few minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=60,
+                            help="Skip fan-outs queued less than this many seconds ago; they are probably still running.")
+
+    def handle(self, *args, **options):
+        finished = fan_out_pending(min_age=options['min_age'])
+        self.stdout.write(self.style.SUCCESS(f"Finished {finished} pending fan-out(s)."))
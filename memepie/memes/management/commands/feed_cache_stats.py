@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from memes.feed_cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Print hit/miss counts for the per-user feed and suggestion caches. "
+        "Only meaningful with a shared cache backend (file, redis, memcached)."
+    )
+
+    def handle(self, *args, **options):
+        for name, counts in cache_stats().items():
+            total = counts['hit'] + counts['miss']
+            ratio = counts['hit'] / total if total else 0
+            self.stdout.write(f"{name}: {counts['hit']} hit(s), {counts['miss']} miss(es), hit ratio {ratio:.1%}")
@@ -0,0 +1,42 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from memes.media_jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued media processing (image variants) for uploaded memes. Keep one running next to the web server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.MEDIA_WORKERS,
+                            help="Pool processes; 0 runs jobs in this process.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers <= 0:
+            self._work(None, batch=1, once=options['once'])
+            return
+        # Spawned rather than forked, so no process shares this one's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        ) as pool:
+            self._work(pool, batch=workers * 2, once=options['once'])
+
+    def _work(self, pool, batch, once):
+        processed = 0
+        while True:
+            ran = run_pending(limit=batch, pool=pool)
+            processed += ran
+            if not ran:
+                if once:
+                    break
+                time.sleep(settings.MEDIA_JOB_POLL_SECONDS)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} media job(s)."))
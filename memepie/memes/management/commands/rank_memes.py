@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from memes.ranking import rank_all_memes
+
+
+class Command(BaseCommand):
+    help = "Recompute the hot score of every meme (run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        ranked = rank_all_memes(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {ranked} meme(s)."))
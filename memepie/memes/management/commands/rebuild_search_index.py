@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from memes.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for meme captions and user names."
+
+    def handle(self, *args, **options):
+        memes, users = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {memes} meme(s) and {users} user(s)."))
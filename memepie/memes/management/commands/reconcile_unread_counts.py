@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from memepie.unread import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount every user's unread message and notification badges (run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled unread counts for {processed} user(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from memes.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like/comment/reply counters and fix any that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repaired = repair_counters(batch_size=options['batch_size'])
+        for counter, rows in repaired.items():
+            self.stdout.write(f"{counter}: {rows} row(s) repaired")
+        self.stdout.write(self.style.SUCCESS("Counters are in sync."))
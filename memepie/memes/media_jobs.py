@@ -0,0 +1,149 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from accounts.models import Profile, PROFILE_PIC_VARIANTS
+from memepie.images import refresh_variants
+from .feed_cache import bump_content_version
+from .models import MediaJob, Meme, MEME_IMAGE_VARIANTS
+
+# Database-backed queue for the slow part of an upload. upload_meme saves the
+# row and the original file, marks the meme 'pending' and enqueues a MediaJob;
+# signup and profile edits do the same for a new profile picture. The
+# process_media worker claims due jobs, runs each in a process pool and
+# records the outcome. Failures are retried with exponential backoff up to
+# MEDIA_JOB_MAX_ATTEMPTS times, and jobs left 'running' longer than
+# MEDIA_JOB_TIMEOUT (a crashed worker) are claimed again. Templates show a
+# placeholder for pending memes; a profile shows its original picture until
+# the avatar is ready.
+
+
+def _enqueue(target):
+    job, _ = MediaJob.objects.update_or_create(**target, defaults={
+        'status': 'pending', 'attempts': 0, 'run_after': timezone.now(), 'locked_at': None, 'last_error': '',
+    })
+    if settings.MEDIA_JOBS_EAGER and _claim(job.pk, timezone.now()):
+        finish(job.pk, run_job(job.pk))
+    return job
+
+
+def enqueue(meme):
+    """Queue media processing for a saved meme and mark it pending."""
+    Meme.objects.filter(pk=meme.pk).update(media_status='pending')
+    meme.media_status = 'pending'
+    job = _enqueue({'meme': meme})
+    if settings.MEDIA_JOBS_EAGER:
+        meme.refresh_from_db(fields=['media_status', 'image_variants'])
+    return job
+
+
+def enqueue_profile_pic(profile):
+    """Queue the avatar of a newly saved profile picture."""
+    # The old avatar belongs to the previous picture; show the new original until the job runs
+    for name in profile.profile_pic_variants.values():
+        profile.profile_pic.storage.delete(name)
+    profile.profile_pic_variants = {}
+    profile.save(update_fields=['profile_pic_variants'])
+    job = _enqueue({'profile': profile})
+    if settings.MEDIA_JOBS_EAGER:
+        profile.refresh_from_db(fields=['profile_pic_variants'])
+    return job
+
+
+def process_meme(meme_id):
+    """Everything an upload needs after the row is saved. Runs inside a worker process."""
+    meme = Meme.objects.filter(pk=meme_id).first()
+    if meme is None:
+        return
+    refresh_variants(meme, 'image', 'image_variants', MEME_IMAGE_VARIANTS)
+
+
+def process_profile_pic(profile_id):
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None:
+        return
+    refresh_variants(profile, 'profile_pic', 'profile_pic_variants', PROFILE_PIC_VARIANTS)
+
+
+def run_job(job_id):
+    """Process a job's meme or profile picture, returning None on success or the traceback as text."""
+    try:
+        meme_id, profile_id = MediaJob.objects.filter(pk=job_id).values_list('meme_id', 'profile_id').get()
+        if meme_id:
+            process_meme(meme_id)
+        else:
+            process_profile_pic(profile_id)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def run_job_in_worker(job_id):
+    # Pool processes hold their connection across jobs; drop it if the server went away
+    close_old_connections()
+    return run_job(job_id)
+
+
+def _claimable(now):
+    stale = now - timedelta(seconds=settings.MEDIA_JOB_TIMEOUT)
+    return Q(status='pending', run_after__lte=now) | Q(status='running', locked_at__lt=stale)
+
+
+def _claim(job_id, now):
+    # Conditional update, so two workers racing for the same job cannot both win
+    return MediaJob.objects.filter(_claimable(now), pk=job_id).update(
+        status='running', locked_at=now, attempts=F('attempts') + 1,
+    ) == 1
+
+
+def claim_jobs(limit):
+    """Claim up to `limit` due jobs. Returns their ids."""
+    now = timezone.now()
+    candidates = MediaJob.objects.filter(_claimable(now)).order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    return [job_id for job_id in candidates if _claim(job_id, now)]
+
+
+def finish(job_id, error=None):
+    """Record a job's outcome: done, retried later, or failed for good."""
+    job = MediaJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return
+    if error is None:
+        job.status, job.last_error, meme_status = 'done', '', 'ready'
+    elif job.attempts >= settings.MEDIA_JOB_MAX_ATTEMPTS:
+        job.status, job.last_error, meme_status = 'failed', error, 'failed'
+    else:
+        delay = settings.MEDIA_JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+        job.status, job.last_error, meme_status = 'pending', error, None
+        job.run_after = timezone.now() + timedelta(seconds=delay)
+    job.locked_at = None
+    job.save(update_fields=['status', 'last_error', 'run_after', 'locked_at', 'updated_at'])
+    if meme_status and job.meme_id:
+        Meme.objects.filter(pk=job.meme_id).update(media_status=meme_status)
+        bump_content_version()
+
+
+def run_pending(limit=100, pool=None):
+    """
+    Claim and run up to `limit` due jobs, in `pool` (a concurrent.futures
+    executor) when given, else one after another in this process. Returns
+    the number of jobs run.
+    """
+    claimed = claim_jobs(limit)
+    if pool is None:
+        for job_id in claimed:
+            finish(job_id, run_job(job_id))
+    else:
+        futures = {job_id: pool.submit(run_job_in_worker, job_id) for job_id in claimed}
+        for job_id, future in futures.items():
+            try:
+                error = future.result()
+            except Exception:
+                # The worker process itself died (e.g. BrokenProcessPool)
+                error = traceback.format_exc()
+            finish(job_id, error)
+    return len(claimed)
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# TIMELINE_BACKFILL_SIZE as of this migration
+BACKFILL_SIZE = 200
+
+
+def backfill_timelines(apps, schema_editor):
+    # Give every existing follow the author's recent memes, as a new follow would get
+    Follow = apps.get_model('memes', 'Follow')
+    Meme = apps.get_model('memes', 'Meme')
+    TimelineEntry = apps.get_model('memes', 'TimelineEntry')
+    for follower_id, author_id in Follow.objects.values_list('follower_id', 'following_id').iterator():
+        recent = Meme.objects.filter(author_id=author_id).order_by('-created_at').values_list('id', 'created_at')
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user_id=follower_id, meme_id=meme_id, author_id=author_id, created_at=created_at)
+            for meme_id, created_at in recent[:BACKFILL_SIZE]
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0005_alter_comment_id_alter_follow_id_alter_meme_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('meme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='memes.meme')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-meme'], name='timeline_user_rank_idx'), models.Index(fields=['user', 'author'], name='timeline_user_author_idx')],
+                'unique_together': {('user', 'meme')},
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, outer_field):
+    counts = queryset.filter(**{outer_field: OuterRef('pk')}).order_by().values(outer_field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Meme = apps.get_model('memes', 'Meme')
+    Comment = apps.get_model('memes', 'Comment')
+    Meme.objects.update(
+        likes_count=_count(Meme.faa_likes.through.objects.all(), 'meme_id'),
+        comments_count=_count(Comment.objects.all(), 'meme_id'),
+    )
+    Comment.objects.update(
+        likes_count=_count(Comment.likes.through.objects.all(), 'comment_id'),
+        replies_count=_count(Comment.objects.all(), 'parent_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='meme',
+            index=models.Index(fields=['-likes_count', '-created_at', '-id'], name='meme_popularity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
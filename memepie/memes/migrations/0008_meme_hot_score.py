@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:29
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+# The hot score formula as of this migration (memes/ranking.py), frozen here
+HOT_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+HOT_DECAY_SECONDS = 45000
+COMMENT_WEIGHT = 2
+
+
+def score_existing_memes(apps, schema_editor):
+    Meme = apps.get_model('memes', 'Meme')
+    memes = list(Meme.objects.only('id', 'likes_count', 'comments_count', 'created_at'))
+    for meme in memes:
+        engagement = meme.likes_count + COMMENT_WEIGHT * meme.comments_count
+        age = (meme.created_at - HOT_EPOCH).total_seconds()
+        meme.hot_score = math.log10(max(engagement, 1)) + age / HOT_DECAY_SECONDS
+    Meme.objects.bulk_update(memes, ['hot_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0007_meme_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='meme',
+            index=models.Index(fields=['-hot_score', '-id'], name='meme_hot_idx'),
+        ),
+        migrations.RunPython(score_existing_memes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def group_existing(apps, schema_editor):
+    # Fold existing rows into one per (recipient, type, meme), keeping the newest
+    Notification = apps.get_model('memes', 'Notification')
+    NotificationActor = apps.get_model('memes', 'NotificationActor')
+    groups = {}
+    for notification in Notification.objects.order_by('-created_at', '-id').iterator():
+        key = f'{notification.recipient_id}:{notification.notification_type}:{notification.meme_id or 0}'
+        groups.setdefault(key, []).append(notification)
+
+    for key, rows in groups.items():
+        keep = rows[0]
+        actor_ids = {row.sender_id for row in rows}
+        keep.group_key = key
+        keep.actor_count = len(actor_ids)
+        keep.updated_at = keep.created_at
+        keep.is_read = all(row.is_read for row in rows)
+        keep.save(update_fields=['group_key', 'actor_count', 'updated_at', 'is_read'])
+        NotificationActor.objects.bulk_create([
+            NotificationActor(notification_id=keep.id, actor_id=actor_id) for actor_id in actor_ids
+        ])
+        Notification.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0009_suggestion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notification',
+            options={'ordering': ['-updated_at']},
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='memes.notification')),
+            ],
+            options={
+                'unique_together': {('notification', 'actor')},
+            },
+        ),
+        migrations.RunPython(group_existing, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='notification',
+            name='group_key',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:03
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def watermark_read_notifications(apps, schema_editor):
+    # Everything up to the newest read notification counts as seen, unless an
+    # unread one is older: then stop just before it so it stays unread (a few
+    # newer read rows may show as unread again, but nothing unread gets lost)
+    Notification = apps.get_model('memes', 'Notification')
+    NotificationWatermark = apps.get_model('memes', 'NotificationWatermark')
+    seen = dict(
+        Notification.objects.filter(is_read=True).values('recipient_id').annotate(seen_at=Max('updated_at'))
+        .values_list('recipient_id', 'seen_at')
+    )
+    earliest_unread = dict(
+        Notification.objects.filter(is_read=False).values('recipient_id').annotate(first=Min('updated_at'))
+        .values_list('recipient_id', 'first')
+    )
+    for user_id, first in earliest_unread.items():
+        if user_id in seen and first <= seen[user_id]:
+            seen[user_id] = first - timedelta(microseconds=1)
+    NotificationWatermark.objects.bulk_create([
+        NotificationWatermark(user_id=user_id, seen_at=seen_at) for user_id, seen_at in seen.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0010_notification_groups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seen_at', models.DateTimeField()),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_watermark', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(watermark_read_notifications, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notification',
+            name='is_read',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-updated_at', '-id'], name='notif_recipient_rank_idx'),
+        ),
+    ]
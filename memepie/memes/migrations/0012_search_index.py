@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:20
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("CREATE VIRTUAL TABLE memes_meme_fts USING fts5(caption, prefix='2 3')")
+        schema_editor.execute("CREATE VIRTUAL TABLE memes_user_fts USING fts5(username, name, prefix='2 3')")
+        schema_editor.execute('INSERT INTO memes_meme_fts (rowid, caption) SELECT id, caption FROM memes_meme')
+        schema_editor.execute(
+            "INSERT INTO memes_user_fts (rowid, username, name) "
+            "SELECT id, username, trim(first_name || ' ' || last_name) FROM auth_user"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX memes_meme_caption_search_idx ON memes_meme USING GIN (to_tsvector('simple', caption))"
+        )
+        schema_editor.execute(
+            "CREATE INDEX memes_user_name_search_idx ON auth_user "
+            "USING GIN (to_tsvector('simple', username || ' ' || first_name || ' ' || last_name))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE memes_meme_fts')
+        schema_editor.execute('DROP TABLE memes_user_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX memes_meme_caption_search_idx')
+        schema_editor.execute('DROP INDEX memes_user_name_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0011_notification_watermark'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0014_media_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='image_ahash',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='image_dhash',
+            field=models.CharField(blank=True, db_index=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='image_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='near_duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='memes.meme'),
+        ),
+        migrations.CreateModel(
+            name='MemeHashBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('value', models.PositiveIntegerField()),
+                ('meme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hash_bands', to='memes.meme')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'value'], name='meme_hash_band_idx')],
+                'unique_together': {('meme', 'band')},
+            },
+        ),
+    ]
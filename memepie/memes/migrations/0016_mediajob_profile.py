@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_profile_profile_pic_variants'),
+        ('memes', '0015_image_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediajob',
+            name='profile',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='media_job', to='accounts.profile'),
+        ),
+        migrations.AlterField(
+            model_name='mediajob',
+            name='meme',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='media_job', to='memes.meme'),
+        ),
+        migrations.AddConstraint(
+            model_name='mediajob',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('meme__isnull', False), ('profile__isnull', True)), models.Q(('meme__isnull', True), ('profile__isnull', False)), _connector='OR'), name='mediajob_one_target'),
+        ),
+    ]
@@ -1,5 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from memepie.images import Variant, variant_url
+
+# Renditions generated at upload, see memepie/images.py
+MEME_IMAGE_VARIANTS = {
+    'thumb': Variant(320, True, 'JPEG'),
+    'thumb_webp': Variant(320, True, 'WEBP'),
+    'feed': Variant(1080, False, 'JPEG'),
+    'feed_webp': Variant(1080, False, 'WEBP'),
+}
 
 class Meme(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='memes')
@@ -7,13 +20,60 @@ class Meme(models.Model):
     caption = models.TextField()
     faa_likes = models.ManyToManyField(User, related_name='liked_memes', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters, kept in sync by the receivers at the bottom of this module
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Time-decayed popularity, see ranking.py
+    hot_score = models.FloatField(default=0)
+    # Storage names of the MEME_IMAGE_VARIANTS renditions
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Uploads wait as 'pending' until their MediaJob has run (see media_jobs.py)
+    MEDIA_STATUSES = (
+        ('pending', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUSES, default='ready')
+    # Upload fingerprints (see duplicates.py): SHA-256 of the file, and aHash/dHash as hex
+    image_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    image_ahash = models.CharField(max_length=16, blank=True)
+    image_dhash = models.CharField(max_length=16, blank=True, db_index=True)
+    near_duplicate_of = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='near_duplicates',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-likes_count', '-created_at', '-id'], name='meme_popularity_idx'),
+            models.Index(fields=['-hot_score', '-id'], name='meme_hot_idx'),
+        ]
 
     def __str__(self):
         return f"{self.author.username} - {self.caption[:20]}"
 
     @property
     def total_faa_likes(self):
-        return self.faa_likes.count()
+        return self.likes_count
+
+    @property
+    def is_processing(self):
+        return self.media_status == 'pending'
+
+    @property
+    def feed_url(self):
+        return variant_url(self.image, self.image_variants, 'feed')
+
+    @property
+    def feed_webp_url(self):
+        return variant_url(self.image, self.image_variants, 'feed_webp', fallback=False)
+
+    @property
+    def thumb_url(self):
+        return variant_url(self.image, self.image_variants, 'thumb')
+
+    @property
+    def thumb_webp_url(self):
+        return variant_url(self.image, self.image_variants, 'thumb_webp', fallback=False)
 
 class Comment(models.Model):
     meme = models.ForeignKey(Meme, on_delete=models.CASCADE, related_name='comments')
@@ -22,13 +82,15 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
     likes = models.ManyToManyField(User, related_name='liked_comments', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    likes_count = models.PositiveIntegerField(default=0)
+    replies_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.meme}"
 
     @property
     def total_likes(self):
-        return self.likes.count()
+        return self.likes_count
 
 class Follow(models.Model):
     follower = models.ForeignKey(User, related_name='following', on_delete=models.CASCADE)
@@ -52,8 +114,294 @@ class Notification(models.Model):
     meme = models.ForeignKey(Meme, on_delete=models.CASCADE, null=True, blank=True)
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     text_preview = models.CharField(max_length=100, blank=True)
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # One row per (recipient, type, meme): repeat events fold into it, see notifications.py.
+    # `sender` is the latest actor and actor_count how many distinct users took part.
+    group_key = models.CharField(max_length=64, unique=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notif_recipient_rank_idx'),
+        ]
+
+    @property
+    def other_actors_count(self):
+        return self.actor_count - 1
+
+class NotificationWatermark(models.Model):
+    # Read state: every notification updated after seen_at is unread
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_watermark')
+    seen_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username} has seen notifications up to {self.seen_at}"
+
+class NotificationActor(models.Model):
+    # Who already counts towards a grouped notification, so repeat clicks are not counted twice
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='actors')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ('notification', 'actor')
+
+class TimelineEntry(models.Model):
+    # Materialized "following" feed: one row per (reader, meme) written when the meme is posted
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    meme = models.ForeignKey(Meme, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'meme')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-meme'], name='timeline_user_rank_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.meme_id} in {self.user.username}'s timeline"
+
+class PendingFanOut(models.Model):
+    # A large-audience fan-out not yet written; see timeline.py and the fan_out_timelines command
+    meme = models.OneToOneField(Meme, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Fan-out of meme {self.meme_id} pending since {self.created_at}"
+
+class Suggestion(models.Model):
+    # Precomputed "who to follow" list, rebuilt by the build_suggestions command (see suggestions.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='suggestion_user_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.suggested_id} suggested to {self.user_id} ({self.score:.2f})"
+
+class MediaJob(models.Model):
+    # Queued media processing for one meme or profile picture, claimed and run by the process_media worker
+    STATUSES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    meme = models.OneToOneField(Meme, on_delete=models.CASCADE, null=True, blank=True, related_name='media_job')
+    profile = models.OneToOneField(
+        'accounts.Profile', on_delete=models.CASCADE, null=True, blank=True, related_name='media_job',
+    )
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='mediajob_queue_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(meme__isnull=False, profile__isnull=True)
+                | models.Q(meme__isnull=True, profile__isnull=False),
+                name='mediajob_one_target',
+            ),
+        ]
+
+    def __str__(self):
+        target = f"meme {self.meme_id}" if self.meme_id else f"profile {self.profile_id}"
+        return f"Media job for {target} ({self.status}, {self.attempts} attempt(s))"
+
+class MemeHashBand(models.Model):
+    # One 16-bit slice of a meme's dHash, indexed so near-duplicate lookups are exact matches (see duplicates.py)
+    meme = models.ForeignKey(Meme, on_delete=models.CASCADE, related_name='hash_bands')
+    band = models.PositiveSmallIntegerField()
+    value = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('meme', 'band')
+        indexes = [
+            models.Index(fields=['band', 'value'], name='meme_hash_band_idx'),
+        ]
+
+@receiver(post_save, sender=Meme)
+def fan_out_new_meme(sender, instance, created, **kwargs):
+    if created:
+        from .timeline import fan_out_meme
+        fan_out_meme(instance)
+
+@receiver(post_save, sender=Meme)
+def rank_new_meme(sender, instance, created, **kwargs):
+    if created:
+        from .ranking import hot_score
+        instance.hot_score = hot_score(instance.likes_count, instance.comments_count, instance.created_at)
+        Meme.objects.filter(pk=instance.pk).update(hot_score=instance.hot_score)
+
+@receiver(post_save, sender=Follow)
+def backfill_followed_author(sender, instance, created, **kwargs):
+    if created:
+        from .timeline import backfill_author
+        backfill_author(instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender=Follow)
+def remove_unfollowed_author(sender, instance, **kwargs):
+    from .timeline import remove_author
+    remove_author(instance.follower_id, instance.following_id)
+
+@receiver(m2m_changed, sender=Meme.faa_likes.through)
+def sync_meme_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    from .counters import sync_like_counter
+    sync_like_counter(Meme, sender, 'meme_id', instance, action, reverse, pk_set)
+
+@receiver(m2m_changed, sender=Comment.likes.through)
+def sync_comment_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    from .counters import sync_like_counter
+    sync_like_counter(Comment, sender, 'comment_id', instance, action, reverse, pk_set)
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        from .counters import sync_comment_counters
+        sync_comment_counters(instance, 1)
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    from .counters import sync_comment_counters
+    sync_comment_counters(instance, -1)
+
+@receiver(post_save, sender=User)
+def reset_new_user_feed_cache(sender, instance, created, **kwargs):
+    # Ids can be reused (e.g. after a rollback), so never inherit an old cache version
+    if created:
+        from .feed_cache import bump_user_version
+        bump_user_version(instance.pk)
+
+@receiver(post_save, sender=Meme)
+def invalidate_author_feed_cache(sender, instance, created, **kwargs):
+    # Followers are bumped by the timeline fan-out once their entries are written
+    if created:
+        from .feed_cache import bump_user_version, bump_content_version
+        bump_user_version(instance.author_id)
+        bump_content_version()
+
+@receiver(post_delete, sender=Meme)
+def invalidate_deleted_meme_feed_cache(sender, instance, **kwargs):
+    from .feed_cache import bump_user_versions, bump_content_version
+    follower_ids = Follow.objects.filter(following_id=instance.author_id).values_list('follower_id', flat=True)
+    bump_user_versions([instance.author_id, *follower_ids])
+    bump_content_version()
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_cache(sender, instance, **kwargs):
+    from .feed_cache import bump_user_version
+    bump_user_version(instance.follower_id)
+
+@receiver(m2m_changed, sender=Meme.faa_likes.through)
+def invalidate_liker_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    from .feed_cache import bump_user_version, bump_content_version
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_content_version()
+    if reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        bump_user_version(instance.pk)
+    elif not reverse and action in ('post_add', 'post_remove') and pk_set:
+        for user_id in pk_set:
+            bump_user_version(user_id)
+    elif not reverse and action == 'pre_clear':
+        for user_id in instance.faa_likes.values_list('id', flat=True):
+            bump_user_version(user_id)
+
+@receiver(post_save, sender=Comment)
+def invalidate_commenter_cache(sender, instance, created, **kwargs):
+    if created:
+        from .feed_cache import bump_user_version
+        bump_user_version(instance.author_id)
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_content(sender, instance, **kwargs):
+    if kwargs.get('created', True):
+        from .feed_cache import bump_content_version
+        bump_content_version()
+
+@receiver(post_save, sender=Follow)
+def update_suggestions_on_follow(sender, instance, created, **kwargs):
+    if created:
+        from .suggestions import follow_created
+        follow_created(instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender=Follow)
+def update_suggestions_on_unfollow(sender, instance, **kwargs):
+    from .suggestions import follow_deleted
+    follow_deleted(instance.follower_id, instance.following_id)
+
+@receiver(m2m_changed, sender=Meme.faa_likes.through)
+def update_suggestions_on_like(sender, instance, action, reverse, pk_set, **kwargs):
+    from .suggestions import likes_changed
+    if action == 'post_add' and pk_set:
+        pairs = [(instance.pk, meme_id) for meme_id in pk_set] if reverse else [(user_id, instance.pk) for user_id in pk_set]
+        likes_changed(pairs, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # Read what is really there before the rows go
+        rows = sender.objects.filter(**{'user_id' if reverse else 'meme_id': instance.pk})
+        if action == 'pre_remove':
+            rows = rows.filter(**{'meme_id__in' if reverse else 'user_id__in': pk_set or ()})
+        likes_changed(list(rows.values_list('user_id', 'meme_id')), -1)
+
+@receiver(post_save, sender=Meme)
+def index_meme_caption(sender, instance, **kwargs):
+    from .search import index_meme
+    index_meme(instance)
+
+@receiver(post_save, sender=Meme)
+def index_meme_hash(sender, instance, created, update_fields=None, **kwargs):
+    if (update_fields is None or 'image_dhash' in update_fields) and (instance.image_dhash or not created):
+        from .duplicates import index_hash
+        index_hash(instance)
+
+@receiver(post_delete, sender=Meme)
+def unindex_meme_caption(sender, instance, **kwargs):
+    from .search import unindex_meme
+    unindex_meme(instance.pk)
+
+@receiver(post_save, sender=User)
+def index_user_name(sender, instance, **kwargs):
+    from .search import index_user
+    index_user(instance)
+
+@receiver(post_delete, sender=User)
+def unindex_user_name(sender, instance, **kwargs):
+    from .search import unindex_user
+    unindex_user(instance.pk)
+
+@receiver(post_save, sender=User)
+def update_user_typeahead(sender, instance, **kwargs):
+    from .typeahead import typeahead
+    typeahead.update_user(instance.pk, instance.username, instance.first_name, instance.last_name)
+
+@receiver(post_delete, sender=User)
+def remove_user_typeahead(sender, instance, **kwargs):
+    from .typeahead import typeahead
+    typeahead.remove_user(instance.pk)
+
+@receiver(post_save, sender=Follow)
+def add_follow_typeahead(sender, instance, created, **kwargs):
+    if created:
+        from .typeahead import typeahead
+        typeahead.follow(instance.follower_id, instance.following_id, 1)
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_typeahead(sender, instance, **kwargs):
+    from .typeahead import typeahead
+    typeahead.follow(instance.follower_id, instance.following_id, -1)
@@ -0,0 +1,114 @@
+from collections import namedtuple
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from memepie import realtime, unread
+
+from .models import Notification, NotificationActor, NotificationWatermark
+
+Event = namedtuple('Event', 'recipient_id sender_id notification_type meme_id text_preview')
+
+
+def group_key(recipient_id, notification_type, meme_id=None):
+    return f'{recipient_id}:{notification_type}:{meme_id or 0}'
+
+
+def notify(events):
+    """
+    Record a batch of Events, folding them into one notification per
+    (recipient, type, meme). A group moves to the top, and so becomes unread
+    again, when a new user joins it ("alice and 41 others liked your meme");
+    a user repeating the same action only counts once. Comments always
+    refresh the group so the preview shows the latest one. Events users
+    cause on their own content are dropped.
+    """
+    groups = {}
+    for event in events:
+        if event.recipient_id == event.sender_id:
+            continue
+        key = group_key(event.recipient_id, event.notification_type, event.meme_id)
+        groups.setdefault(key, []).append(event)
+    if not groups:
+        return
+
+    Notification.objects.bulk_create([
+        Notification(
+            group_key=key,
+            recipient_id=batch[-1].recipient_id,
+            sender_id=batch[-1].sender_id,
+            notification_type=batch[-1].notification_type,
+            meme_id=batch[-1].meme_id,
+            text_preview=batch[-1].text_preview,
+            actor_count=0,
+        )
+        for key, batch in groups.items()
+    ], ignore_conflicts=True)
+    notifications = {n.group_key: n for n in Notification.objects.filter(group_key__in=groups)}
+
+    known = set(
+        NotificationActor.objects.filter(notification__in=notifications.values())
+        .filter(actor_id__in={event.sender_id for batch in groups.values() for event in batch})
+        .values_list('notification_id', 'actor_id')
+    )
+    watermarks = dict(
+        NotificationWatermark.objects.filter(user_id__in={n.recipient_id for n in notifications.values()})
+        .values_list('user_id', 'seen_at')
+    )
+    new_actors, refreshed, newly_unread = [], [], []
+    now = timezone.now()
+    for key, batch in groups.items():
+        notification = notifications[key]
+        joined = {event.sender_id for event in batch} - {actor for nid, actor in known if nid == notification.id}
+        new_actors += [NotificationActor(notification=notification, actor_id=actor_id) for actor_id in joined]
+        if joined or notification.notification_type == 'comment':
+            watermark = watermarks.get(notification.recipient_id)
+            was_unread = notification.actor_count and (watermark is None or notification.updated_at > watermark)
+            if not was_unread:
+                newly_unread.append(notification.recipient_id)
+            latest = batch[-1]
+            notification.sender_id = latest.sender_id
+            notification.text_preview = latest.text_preview
+            notification.updated_at = now
+            refreshed.append(notification)
+
+    NotificationActor.objects.bulk_create(new_actors, ignore_conflicts=True)
+    Notification.objects.bulk_update(refreshed, ['sender', 'text_preview', 'updated_at'])
+    actor_counts = (
+        NotificationActor.objects.filter(notification=OuterRef('pk')).order_by()
+        .values('notification').annotate(total=Count('pk')).values('total')
+    )
+    Notification.objects.filter(pk__in=[n.pk for n in refreshed]).update(
+        actor_count=Coalesce(Subquery(actor_counts), 0)
+    )
+    unread.adjust(unread.NOTIFICATIONS, newly_unread, 1)
+    for notification in refreshed:
+        realtime.publish([notification.recipient_id], 'notification', {
+            'id': notification.id,
+            'notification_type': notification.notification_type,
+            'text_preview': notification.text_preview,
+            'meme_id': notification.meme_id,
+        })
+    realtime.publish_unread_counts({notification.recipient_id for notification in refreshed})
+
+
+def seen_at(user):
+    return NotificationWatermark.objects.filter(user=user).values_list('seen_at', flat=True).first()
+
+
+def unread_count(user):
+    """Groups updated since the user last opened their notifications (an index range count)."""
+    notifications = Notification.objects.filter(recipient=user)
+    watermark = seen_at(user)
+    if watermark is not None:
+        notifications = notifications.filter(updated_at__gt=watermark)
+    return notifications.count()
+
+
+def mark_seen(user, up_to):
+    """Move the user's watermark forward to `up_to` (never back)."""
+    if not NotificationWatermark.objects.filter(user=user, seen_at__lt=up_to).update(seen_at=up_to):
+        NotificationWatermark.objects.get_or_create(user=user, defaults={'seen_at': up_to})
+    unread.forget(unread.NOTIFICATIONS, [user.id])
+    realtime.publish_unread_counts([user.id])
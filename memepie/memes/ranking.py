@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .models import Meme
+
+# Reddit-style hot score: log-scaled engagement plus a linear bonus for recency.
+# Every HOT_DECAY_SECONDS a meme needs 10x the engagement to keep its place
+# against newer posts. The score never changes just because time passes, so a
+# meme only needs re-scoring when its counters change; the batch job is there to
+# backfill and repair.
+HOT_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+HOT_DECAY_SECONDS = 45000
+COMMENT_WEIGHT = 2
+
+
+def compute_hot_scores(likes, comments, created_ts):
+    """Vectorized hot score over parallel arrays of counts and UNIX timestamps."""
+    engagement = np.asarray(likes, dtype=np.float64) + COMMENT_WEIGHT * np.asarray(comments, dtype=np.float64)
+    age = np.asarray(created_ts, dtype=np.float64) - HOT_EPOCH.timestamp()
+    return np.log10(np.maximum(engagement, 1.0)) + age / HOT_DECAY_SECONDS
+
+
+def hot_score(likes, comments, created_at):
+    return float(compute_hot_scores([likes], [comments], [created_at.timestamp()])[0])
+
+
+def _score_rows(rows):
+    if not rows:
+        return []
+    ids, likes, comments, created = zip(*rows)
+    scores = compute_hot_scores(likes, comments, [c.timestamp() for c in created])
+    return [Meme(id=meme_id, hot_score=float(score)) for meme_id, score in zip(ids, scores)]
+
+
+def refresh_hot_scores(meme_ids):
+    """Re-score specific memes after their like/comment counters moved."""
+    rows = list(
+        Meme.objects.filter(id__in=meme_ids).values_list('id', 'likes_count', 'comments_count', 'created_at')
+    )
+    Meme.objects.bulk_update(_score_rows(rows), ['hot_score'])
+
+
+def rank_all_memes(batch_size=5000):
+    """Recompute hot scores for the whole catalogue in id-ordered batches."""
+    ranked = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Meme.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'likes_count', 'comments_count', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return ranked
+        Meme.objects.bulk_update(_score_rows(rows), ['hot_score'], batch_size=batch_size)
+        ranked += len(rows)
+        last_id = rows[-1][0]
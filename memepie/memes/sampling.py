@@ -0,0 +1,54 @@
+import random
+
+from django.db.models import Max, Min
+
+# Draw this many random ids per wanted row, so gaps in the id space and
+# filtered-out rows rarely force a second round
+OVERSAMPLE = 3
+ROUNDS = 3
+
+
+def sample_ids(queryset, count, exclude=()):
+    """
+    Pick up to `count` random primary keys from `queryset`, skipping
+    `exclude`, without sorting the table. Random ids are drawn between the
+    lowest and highest key and kept if they exist (rejection sampling); if the
+    id space is too sparse for that, the rest is read forward from a random
+    pivot. Every query is a primary-key index lookup.
+    """
+    if count <= 0:
+        return []
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return []
+
+    excluded = set(exclude)
+    tried = set(excluded)
+    chosen = []
+    for _ in range(ROUNDS):
+        needed = count - len(chosen)
+        untried = high - low + 1 - len(tried)
+        if needed <= 0 or untried <= 0:
+            break
+        draws = set(random.sample(range(low, high + 1), min(high - low + 1, needed * OVERSAMPLE))) - tried
+        tried |= draws
+        hits = list(queryset.filter(pk__in=draws).values_list('pk', flat=True))
+        random.shuffle(hits)
+        chosen += hits[:needed]
+
+    needed = count - len(chosen)
+    if needed > 0:
+        remaining = queryset.exclude(pk__in=excluded | set(chosen)).order_by('pk').values_list('pk', flat=True)
+        pivot = random.randint(low, high)
+        tail = list(remaining.filter(pk__gte=pivot)[:needed])
+        head = list(remaining.filter(pk__lt=pivot)[:needed - len(tail)]) if len(tail) < needed else []
+        chosen += tail + head
+    return chosen
+
+
+def sample(queryset, count, exclude=()):
+    """Like sample_ids, but returns the model instances in the sampled order."""
+    ids = sample_ids(queryset, count, exclude)
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
@@ -0,0 +1,140 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+
+from .models import Meme
+
+# Full-text search over meme captions and user names. On SQLite the text is
+# copied into FTS5 tables (rowid = meme/user id) by the receivers in
+# models.py; on Postgres GIN expression indexes over to_tsvector() keep
+# themselves current. Both rank by relevance and match every word of the
+# query as a prefix. Any other database falls back to icontains scans.
+# Tables and indexes are created by migration 0012; `rebuild_search_index`
+# repopulates them.
+MEME_TABLE = 'memes_meme_fts'
+USER_TABLE = 'memes_user_fts'
+COLUMNS = {MEME_TABLE: 'caption', USER_TABLE: 'username, name'}
+
+SQLITE_SOURCES = {
+    MEME_TABLE: 'SELECT id, caption FROM memes_meme',
+    USER_TABLE: "SELECT id, username, trim(first_name || ' ' || last_name) FROM auth_user",
+}
+
+POSTGRES_DOCUMENTS = {
+    MEME_TABLE: ('memes_meme', "to_tsvector('simple', caption)"),
+    USER_TABLE: ('auth_user', "to_tsvector('simple', username || ' ' || first_name || ' ' || last_name)"),
+}
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _sqlite_ids(table, terms, offset, limit):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_ids(table, terms, offset, limit):
+    source, document = POSTGRES_DOCUMENTS[table]
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM {source} WHERE {document} @@ to_tsquery('simple', %s) "
+            f"ORDER BY ts_rank({document}, to_tsquery('simple', %s)) DESC, id DESC LIMIT %s OFFSET %s",
+            [tsquery, tsquery, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_ids(table, query, offset, limit, fallback):
+    terms = _terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        return _sqlite_ids(table, terms, offset, limit)
+    if connection.vendor == 'postgresql':
+        return _postgres_ids(table, terms, offset, limit)
+    return list(fallback(query).values_list('id', flat=True)[offset:offset + limit])
+
+
+def _page(model, ids, page_size, queryset=None):
+    # Ids come back one past the page size so the caller knows whether there is more
+    objects = (queryset if queryset is not None else model.objects).in_bulk(ids[:page_size])
+    return [objects[pk] for pk in ids[:page_size] if pk in objects], len(ids) > page_size
+
+
+def search_memes(query, page=1, page_size=20):
+    """Memes whose caption matches `query`, best first. Returns (memes, has_next)."""
+    ids = _search_ids(
+        MEME_TABLE, query, (page - 1) * page_size, page_size + 1,
+        lambda q: Meme.objects.filter(caption__icontains=q).order_by('-created_at'),
+    )
+    return _page(Meme, ids, page_size)
+
+
+def search_users(query, page=1, page_size=20):
+    """Users whose username or name matches `query`, best first. Returns (users, has_next)."""
+    ids = _search_ids(
+        USER_TABLE, query, (page - 1) * page_size, page_size + 1,
+        lambda q: User.objects.filter(
+            Q(username__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q)
+        ).order_by('username'),
+    )
+    return _page(User, ids, page_size, User.objects.select_related('profile'))
+
+
+def _sqlite_replace(table, pk, values):
+    # values=None just removes the row
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+        if values is not None:
+            placeholders = ', '.join(['%s'] * len(values))
+            cursor.execute(f'INSERT INTO {table} (rowid, {COLUMNS[table]}) VALUES (%s, {placeholders})', [pk, *values])
+
+
+def _user_values(user):
+    return [user.username, f'{user.first_name} {user.last_name}'.strip()]
+
+
+def index_meme(meme):
+    if connection.vendor == 'sqlite':
+        _sqlite_replace(MEME_TABLE, meme.pk, [meme.caption])
+
+
+def unindex_meme(meme_id):
+    if connection.vendor == 'sqlite':
+        _sqlite_replace(MEME_TABLE, meme_id, None)
+
+
+def index_user(user):
+    if connection.vendor == 'sqlite':
+        _sqlite_replace(USER_TABLE, user.pk, _user_values(user))
+
+
+def unindex_user(user_id):
+    if connection.vendor == 'sqlite':
+        _sqlite_replace(USER_TABLE, user_id, None)
+
+
+def rebuild():
+    """Repopulate the search index from the tables. Returns (memes, users) indexed."""
+    counts = (Meme.objects.count(), User.objects.count())
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for table, source in SQLITE_SOURCES.items():
+                cursor.execute(f'DELETE FROM {table}')
+                cursor.execute(f'INSERT INTO {table} (rowid, {COLUMNS[table]}) {source}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('REINDEX INDEX memes_meme_caption_search_idx')
+            cursor.execute('REINDEX INDEX memes_user_name_search_idx')
+        else:
+            return 0, 0
+    return counts
@@ -0,0 +1,262 @@
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+
+from .feed_cache import bump_user_version
+from .models import Follow, Meme, Suggestion
+
+# A candidate's score is MUTUAL_FOLLOW_WEIGHT per account the user follows that
+# also follows the candidate, plus CO_LIKE_WEIGHT per meme both of them liked.
+# Each shared meme is damped by how many people liked it, so agreeing on a
+# niche meme counts for more than agreeing on one the whole site liked.
+MUTUAL_FOLLOW_WEIGHT = 3.0
+CO_LIKE_WEIGHT = 1.0
+
+
+def co_like_weight(likers):
+    return CO_LIKE_WEIGHT / np.log2(1.0 + np.maximum(likers, 1))
+
+
+def load_graphs():
+    """
+    Load the follow graph and the user/meme like graph as CSR matrices over a
+    dense user index. Returns (user_ids, follows, likes) where follows[i, j]
+    is 1 when user i follows user j and likes[i, k] is 1 when user i liked
+    the k-th liked meme.
+    """
+    user_ids = np.fromiter(User.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    n = len(user_ids)
+
+    edges = np.array(list(Follow.objects.values_list('follower_id', 'following_id')), dtype=np.int64).reshape(-1, 2)
+    follows = sparse.csr_matrix(
+        (np.ones(len(edges), dtype=np.float32),
+         (np.searchsorted(user_ids, edges[:, 0]), np.searchsorted(user_ids, edges[:, 1]))),
+        shape=(n, n),
+    )
+
+    pairs = np.array(list(Meme.faa_likes.through.objects.values_list('user_id', 'meme_id')), dtype=np.int64).reshape(-1, 2)
+    meme_ids, meme_cols = np.unique(pairs[:, 1], return_inverse=True)
+    likes = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (np.searchsorted(user_ids, pairs[:, 0]), meme_cols)),
+        shape=(n, len(meme_ids)),
+    )
+    follows.sum_duplicates()
+    likes.sum_duplicates()
+    return user_ids, follows, likes
+
+
+def score_batch(follows, likes_weighted, likes_t, start, stop):
+    """Candidate scores for users start..stop-1 as a CSR matrix over all users."""
+    mutual = follows[start:stop] @ follows
+    co_likes = likes_weighted[start:stop] @ likes_t
+    return (MUTUAL_FOLLOW_WEIGHT * mutual + co_likes).tocsr()
+
+
+def top_candidates(row_scores, row_cols, excluded, top_k):
+    keep = ~np.isin(row_cols, excluded)
+    scores, cols = row_scores[keep], row_cols[keep]
+    if len(scores) > top_k:
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        scores, cols = scores[best], cols[best]
+    order = np.lexsort((cols, -scores))
+    return scores[order], cols[order]
+
+
+def build_suggestions(top_k=None, batch_size=None):
+    """
+    Recompute the top-K suggestions for every user from the follow and like
+    graphs and replace the Suggestion table one batch of users at a time.
+    Returns the number of suggestion rows written.
+    """
+    top_k = top_k or settings.SUGGESTIONS_TOP_K
+    batch_size = batch_size or settings.SUGGESTIONS_BATCH_SIZE
+    user_ids, follows, likes = load_graphs()
+    likers = np.asarray(likes.sum(axis=0)).ravel()
+    likes_weighted = (likes @ sparse.diags(co_like_weight(likers))).tocsr()
+    likes_t = likes.T.tocsr()
+
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        stop = min(start + batch_size, len(user_ids))
+        scores = score_batch(follows, likes_weighted, likes_t, start, stop)
+        rows = []
+        for offset in range(stop - start):
+            row = start + offset
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            followed = follows.indices[follows.indptr[row]:follows.indptr[row + 1]]
+            excluded = np.append(followed, row)
+            row_scores, cols = top_candidates(scores.data[lo:hi], scores.indices[lo:hi], excluded, top_k)
+            rows.extend(
+                Suggestion(user_id=int(user_ids[row]), suggested_id=int(user_ids[col]), score=float(score))
+                for score, col in zip(row_scores, cols)
+            )
+        with transaction.atomic():
+            Suggestion.objects.filter(user_id__in=user_ids[start:stop].tolist()).delete()
+            Suggestion.objects.bulk_create(rows, batch_size=settings.SUGGESTIONS_BATCH_SIZE)
+        written += len(rows)
+    return written
+
+
+def apply_score_deltas(deltas):
+    """
+    Add {(user_id, candidate_id): delta} to the precomputed scores. Only users
+    that already have precomputed rows are touched (everyone else is scored
+    live). Candidates that end up at zero are dropped and new positive ones
+    are inserted; the next full build trims lists back to the top K.
+    """
+    user_ids = set(
+        Suggestion.objects.filter(user_id__in={user_id for user_id, _ in deltas})
+        .values_list('user_id', flat=True).distinct()
+    )
+    deltas = {
+        (user_id, candidate_id): delta for (user_id, candidate_id), delta in deltas.items()
+        if user_id in user_ids and user_id != candidate_id and delta
+    }
+    if not deltas:
+        return
+    candidate_ids = {candidate_id for _, candidate_id in deltas}
+    followed = set(
+        Follow.objects.filter(follower_id__in=user_ids, following_id__in=candidate_ids)
+        .values_list('follower_id', 'following_id')
+    )
+    existing = {
+        (row.user_id, row.suggested_id): row
+        for row in Suggestion.objects.filter(user_id__in=user_ids, suggested_id__in=candidate_ids)
+    }
+
+    changed, created, emptied = [], [], []
+    for pair, delta in deltas.items():
+        if pair in followed:
+            continue
+        row = existing.get(pair)
+        if row is None:
+            if delta > 0:
+                created.append(Suggestion(user_id=pair[0], suggested_id=pair[1], score=delta))
+        elif row.score + delta > 1e-6:
+            row.score += delta
+            changed.append(row)
+        else:
+            emptied.append(row.pk)
+
+    with transaction.atomic():
+        Suggestion.objects.bulk_update(changed, ['score'])
+        Suggestion.objects.bulk_create(created, ignore_conflicts=True)
+        Suggestion.objects.filter(pk__in=emptied).delete()
+    for user_id in {user_id for user_id, _ in deltas}:
+        bump_user_version(user_id)
+
+
+def _follow_deltas(follower_id, following_id, sign):
+    # follower now reaches everyone `following` follows, and everyone who
+    # follows `follower` now reaches `following`, one path each
+    deltas = defaultdict(float)
+    for candidate_id in Follow.objects.filter(follower_id=following_id).values_list('following_id', flat=True):
+        deltas[(follower_id, candidate_id)] += sign * MUTUAL_FOLLOW_WEIGHT
+    for user_id in Follow.objects.filter(following_id=follower_id).values_list('follower_id', flat=True):
+        deltas[(user_id, following_id)] += sign * MUTUAL_FOLLOW_WEIGHT
+    return deltas
+
+
+def follow_created(follower_id, following_id):
+    apply_score_deltas(_follow_deltas(follower_id, following_id, 1))
+    Suggestion.objects.filter(user_id=follower_id, suggested_id=following_id).delete()
+
+
+def follow_deleted(follower_id, following_id):
+    apply_score_deltas(_follow_deltas(follower_id, following_id, -1))
+    if Suggestion.objects.filter(user_id=follower_id).exists():
+        # The unfollowed account is a candidate again, with whatever it still earns
+        score = pair_score(follower_id, following_id)
+        if score > 0:
+            Suggestion.objects.update_or_create(user_id=follower_id, suggested_id=following_id, defaults={'score': score})
+
+
+def likes_changed(pairs, sign):
+    """
+    Shift co-like scores for (user_id, meme_id) like pairs that were just
+    added (sign=1) or are about to be removed (sign=-1).
+
+    Each shared meme is weighted by its like count at the time of the change.
+    Pairs that already co-liked the meme keep the weight they were counted
+    with, so as counts grow the live scores drift slightly from a full
+    recomputation (re-weighting them would touch every pair of likers on
+    every like); the nightly build_suggestions puts them back.
+    """
+    pairs = set(pairs)
+    meme_ids = {meme_id for _, meme_id in pairs}
+    likers = defaultdict(list)
+    for user_id, meme_id in Meme.faa_likes.through.objects.filter(meme_id__in=meme_ids).values_list('user_id', 'meme_id'):
+        likers[meme_id].append(user_id)
+    counts = dict(Meme.objects.filter(id__in=meme_ids).values_list('id', 'likes_count'))
+
+    deltas = defaultdict(float)
+    for user_id, meme_id in pairs:
+        weight = sign * float(co_like_weight(counts.get(meme_id, 1)))
+        for other_id in likers[meme_id]:
+            # Two users changed in the same batch meet twice; count them once
+            if other_id != user_id and not ((other_id, meme_id) in pairs and other_id < user_id):
+                deltas[(user_id, other_id)] += weight
+                deltas[(other_id, user_id)] += weight
+    apply_score_deltas(deltas)
+
+
+def pair_score(user_id, candidate_id):
+    """Score of one candidate for one user, computed the same way as score_user."""
+    following = Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+    paths = Follow.objects.filter(follower_id__in=following, following_id=candidate_id).count()
+    shared = list(
+        Meme.objects.filter(faa_likes=user_id).filter(faa_likes=candidate_id).values_list('likes_count', flat=True)
+    )
+    co_likes = float(co_like_weight(np.array(shared, dtype=np.float64)).sum()) if shared else 0.0
+    return MUTUAL_FOLLOW_WEIGHT * paths + co_likes
+
+
+def score_user(user_id):
+    """
+    Score candidates for one user straight from the database with the same
+    weights build_suggestions uses. Returns {candidate_id: score}, excluding
+    the user and everyone they already follow.
+    """
+    following = list(Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True))
+    scores = defaultdict(float)
+
+    mutual = (
+        Follow.objects.filter(follower_id__in=following)
+        .values('following_id').annotate(paths=Count('id')).values_list('following_id', 'paths')
+    )
+    for candidate_id, paths in mutual:
+        scores[candidate_id] += MUTUAL_FOLLOW_WEIGHT * paths
+
+    liked = Meme.faa_likes.through.objects.filter(user_id=user_id).values_list('meme_id', flat=True)
+    co_likers = list(
+        Meme.faa_likes.through.objects.filter(meme_id__in=liked)
+        .values_list('user_id', 'meme__likes_count')
+    )
+    if co_likers:
+        weights = co_like_weight(np.array([likers for _, likers in co_likers], dtype=np.float64))
+        for (candidate_id, _), weight in zip(co_likers, weights):
+            scores[candidate_id] += float(weight)
+
+    for excluded in [user_id, *following]:
+        scores.pop(excluded, None)
+    return dict(scores)
+
+
+def ranked_suggestion_ids(user_id, limit=None):
+    """
+    Suggested user ids for `user_id`, best first. Reads the precomputed table
+    and falls back to scoring live for users the last build has not seen.
+    """
+    following = Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+    precomputed = Suggestion.objects.filter(user_id=user_id)
+    if precomputed.exists():
+        ids = precomputed.exclude(suggested_id__in=following).order_by('-score', 'suggested_id').values_list('suggested_id', flat=True)
+        return list(ids[:limit] if limit else ids)
+    scores = score_user(user_id)
+    ids = sorted(scores, key=lambda candidate_id: (-scores[candidate_id], candidate_id))
+    return ids[:limit] if limit else ids
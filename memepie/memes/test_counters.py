@@ -0,0 +1,60 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from io import StringIO
+from .like_buffer import like_buffer
+from .models import Meme, Comment
+
+class DenormalizedCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1', password='password')
+        self.other = User.objects.create_user(username='user2', password='password')
+        self.client.login(username='user1', password='password')
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        self.meme = Meme.objects.create(author=self.other, image=image, caption="Counted")
+
+    def test_like_and_unlike_update_count(self):
+        url = reverse('like_meme', args=[self.meme.id])
+        data = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual(data['total_likes'], 1)
+        like_buffer.flush()
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 1)
+        data = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual(data['total_likes'], 0)
+        like_buffer.flush()
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 0)
+
+    def test_reverse_side_and_missing_removals(self):
+        self.user.liked_memes.add(self.meme)
+        self.meme.faa_likes.remove(self.other)  # never liked it
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 1)
+        self.user.liked_memes.clear()
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 0)
+
+    def test_comment_and_reply_counts(self):
+        parent = Comment.objects.create(meme=self.meme, author=self.user, content="Parent")
+        Comment.objects.create(meme=self.meme, author=self.other, content="Reply", parent=parent)
+        self.meme.refresh_from_db()
+        parent.refresh_from_db()
+        self.assertEqual(self.meme.comments_count, 2)
+        self.assertEqual(parent.replies_count, 1)
+
+        parent.delete()
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.comments_count, 0)
+
+    def test_repair_counters_fixes_drift(self):
+        self.meme.faa_likes.add(self.user)
+        Meme.objects.filter(id=self.meme.id).update(likes_count=42, comments_count=7)
+        out = StringIO()
+        call_command('repair_counters', stdout=out)
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 1)
+        self.assertEqual(self.meme.comments_count, 0)
+        self.assertIn("Meme.likes_count: 1 row(s) repaired", out.getvalue())
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image, ImageDraw
+from .duplicates import find_near_duplicate, hamming
+from .media_jobs import run_pending
+from .models import MediaJob, Meme, MemeHashBand
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_picture(name='pic.jpg', size=(800, 600), flip=False, quality=90):
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size[0] // 4, size[1] // 4, size[0] // 2, size[1] // 2), fill='red')
+    draw.rectangle((size[0] // 2, size[1] // 8, size[0] - 20, size[1] // 3), fill='blue')
+    if flip:
+        image = image.transpose(Image.Transpose.ROTATE_180)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_JOBS_EAGER=False, NEAR_DUPLICATE_DISTANCE=3)
+class DuplicateUploadTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='password')
+        self.client.force_login(self.user)
+
+    def upload(self, image, caption="meme"):
+        response = self.client.post(reverse('upload_meme'), {'image': image, 'caption': caption}, follow=True)
+        return Meme.objects.latest('id'), response
+
+    def test_upload_stores_hashes(self):
+        meme, _ = self.upload(make_picture())
+        self.assertEqual(len(meme.image_sha256), 64)
+        self.assertEqual(len(meme.image_ahash), 16)
+        self.assertEqual(len(meme.image_dhash), 16)
+        self.assertEqual(MemeHashBand.objects.filter(meme=meme).count(), 4)
+        self.assertIsNone(meme.near_duplicate_of)
+
+    def test_exact_duplicate_reuses_the_stored_file_and_variants(self):
+        original, _ = self.upload(make_picture())
+        run_pending()
+        original.refresh_from_db()
+
+        copy, response = self.upload(make_picture('again.jpg'), "reposted")
+        self.assertContains(response, "This looks like a repost of @uploader")
+        self.assertEqual(copy.image.name, original.image.name)
+        self.assertEqual(copy.image_variants, original.image_variants)
+        self.assertEqual(copy.media_status, 'ready')
+        self.assertEqual(copy.near_duplicate_of, original)
+        self.assertFalse(MediaJob.objects.filter(meme=copy).exists())
+        self.assertFalse(default_storage.exists('memes/again.jpg'))
+
+        # Regenerating one meme's variants leaves the files the other still points at
+        call_command('build_image_variants', '--all', stdout=StringIO())
+        copy.refresh_from_db()
+        self.assertTrue(all(default_storage.exists(name) for name in copy.image_variants.values()))
+
+    def test_exact_duplicate_of_a_pending_meme_still_gets_processed(self):
+        original, _ = self.upload(make_picture())
+        copy, _ = self.upload(make_picture('again.jpg'))
+        self.assertEqual(copy.image.name, original.image.name)
+        self.assertEqual(copy.media_status, 'pending')
+        self.assertEqual(run_pending(), 2)
+
+    def test_near_duplicates_are_flagged(self):
+        original, _ = self.upload(make_picture())
+        resized, response = self.upload(make_picture('small.jpg', size=(400, 300), quality=60))
+        self.assertContains(response, "This looks like a repost")
+        self.assertNotEqual(resized.image.name, original.image.name)
+        self.assertLessEqual(hamming(original.image_dhash, resized.image_dhash), 3)
+        self.assertEqual(resized.near_duplicate_of, original)
+
+        different, _ = self.upload(make_picture('flipped.jpg', flip=True))
+        self.assertIsNone(different.near_duplicate_of)
+
+    def test_lookup_finds_hashes_a_few_bits_apart(self):
+        meme = Meme.objects.create(author=self.user, image='memes/x.jpg', caption="x", image_dhash='f0f0f0f0f0f0f0f0')
+        # One bit off in each of three bands still shares the fourth
+        self.assertEqual(find_near_duplicate('f1f0f0f1f0f1f0f0'), meme)
+        self.assertIsNone(find_near_duplicate('f1f1f1f1f0f0f0f0'))
+        self.assertIsNone(find_near_duplicate('f0f0f0f0f0f0f0f0', before_id=meme.id))
+
+    def test_backfill_command(self):
+        first = Meme.objects.create(author=self.user, image=make_picture(), caption="old")
+        second = Meme.objects.create(author=self.user, image=make_picture('copy.jpg', quality=70), caption="copy")
+        self.assertEqual(first.image_sha256, '')
+
+        out = StringIO()
+        call_command('backfill_image_hashes', stdout=out)
+        self.assertIn("Hashed 2 meme(s), 1 flagged as near duplicates.", out.getvalue())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(first.near_duplicate_of)
+        self.assertEqual(second.near_duplicate_of, first)
+        self.assertEqual(MemeHashBand.objects.count(), 8)
+
+        call_command('backfill_image_hashes', stdout=out)
+        self.assertIn("Hashed 0 meme(s)", out.getvalue())
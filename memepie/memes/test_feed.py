@@ -0,0 +1,118 @@
+import base64
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .models import Follow, Meme
+from .views import get_personalized_feed
+
+@override_settings(FEED_PAGE_SIZE=2)
+class FeedPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.followed = User.objects.create_user(username='followed', password='password')
+        self.liked = User.objects.create_user(username='liked', password='password')
+        self.stranger = User.objects.create_user(username='stranger', password='password')
+        Follow.objects.create(follower=self.user, following=self.followed)
+
+        self.following_memes = [self.make_meme(self.followed, f"follow {i}") for i in range(3)]
+        self.interest_meme = self.make_meme(self.liked, "interest")
+        self.interest_meme.faa_likes.add(self.user)
+        self.fallback_memes = [self.make_meme(self.stranger, f"fallback {i}") for i in range(2)]
+
+    def make_meme(self, author, caption):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        return Meme.objects.create(author=author, image=image, caption=caption)
+
+    def collect_feed(self, user):
+        memes, cursor = get_personalized_feed(user)
+        pages = [memes]
+        while cursor:
+            memes, cursor = get_personalized_feed(user, cursor=cursor)
+            pages.append(memes)
+        return pages
+
+    def test_pages_keep_tier_priority(self):
+        pages = self.collect_feed(self.user)
+        self.assertTrue(all(len(page) <= 2 for page in pages))
+
+        feed = [meme for page in pages for meme in page]
+        self.assertEqual(len(feed), len(set(m.id for m in feed)))
+        self.assertEqual(feed[:3], list(reversed(self.following_memes)))
+        self.assertEqual(feed[3], self.interest_meme)
+        self.assertEqual(set(feed[4:]), set(self.fallback_memes))
+
+    def test_anonymous_feed_is_paginated(self):
+        self.client.logout()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['feed_html'].count('class="post-card'), 2)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_feed_page_endpoint(self):
+        self.client.login(username='reader', password='password')
+        first = self.client.get(reverse('home'))
+        response = self.client.get(reverse('feed_page'), {'cursor': first.context['next_cursor']})
+        data = response.json()
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['count'], 2)
+        self.assertIn(f'id="post-{self.following_memes[0].id}"', data['html'])
+
+    def test_feed_page_rejects_bad_cursor(self):
+        response = self.client.get(reverse('feed_page'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+        for payload in (
+            '{"t":0,"k":["notadate",1]}', '{"t":0,"k":5}', '{"t":0,"k":[[1],2]}', '{"t":0,"k":[1]}',
+            '{"t":-1}', '{"t":99}', '{"t":"0"}',
+        ):
+            for login in (False, True):
+                if login:
+                    self.client.login(username='reader', password='password')
+                cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+                response = self.client.get(reverse('feed_page'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400, (payload, login))
+            self.client.logout()
+
+
+class EmptyFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='reader', password='password')
+
+    def test_empty_feed_shows_empty_state(self):
+        for login in (False, True):
+            if login:
+                self.client.login(username='reader', password='password')
+            response = self.client.get(reverse('home'))
+            self.assertContains(response, 'No memes yet!')
+            self.assertIsNone(response.context['next_cursor'])
+
+
+@override_settings(PROFILE_PAGE_SIZE=2)
+class ProfilePaginationTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password')
+        self.memes = [
+            Meme.objects.create(
+                author=self.author, caption=f"meme {i}",
+                image=SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif'),
+            )
+            for i in range(5)
+        ]
+
+    def test_profile_pages_walk_every_meme(self):
+        response = self.client.get(reverse('user_profile', args=['author']))
+        self.assertEqual(response.context['memes_count'], 5)
+        seen = [meme.id for meme in response.context['memes']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            data = self.client.get(reverse('profile_memes', args=['author']), {'cursor': cursor}).json()
+            seen += [meme.id for meme in self.memes if f'id="post-{meme.id}"' in data['html']][::-1]
+            cursor = data['next_cursor']
+        self.assertEqual(seen, [meme.id for meme in reversed(self.memes)])
+
+    def test_profile_page_rejects_bad_cursor(self):
+        response = self.client.get(reverse('profile_memes', args=['author']), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,105 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from .models import Follow, Meme
+from .feed_cache import cache_stats
+from .views import get_personalized_feed, get_smart_suggestions
+
+class FeedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.third = User.objects.create_user(username='third', password='password')
+
+    def make_meme(self, author, caption="Meme"):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        return Meme.objects.create(author=author, image=image, caption=caption)
+
+    def test_repeat_reads_hit_the_cache(self):
+        self.make_meme(self.author)
+        first, _ = get_personalized_feed(self.user)
+        with self.assertNumQueries(1):  # just the in_bulk fetch of the cached ids
+            second, _ = get_personalized_feed(self.user)
+        self.assertEqual(first, second)
+        self.assertEqual(cache_stats()['feed'], {'hit': 1, 'miss': 1})
+
+    def test_new_meme_invalidates_followers_feeds(self):
+        Follow.objects.create(follower=self.user, following=self.author)
+        get_personalized_feed(self.user)
+        meme = self.make_meme(self.author, "Fresh")
+        memes, _ = get_personalized_feed(self.user)
+        self.assertIn(meme, memes)
+
+    def test_unrelated_upload_keeps_feed_cached(self):
+        get_personalized_feed(self.user)
+        self.make_meme(self.third, "Elsewhere")
+        get_personalized_feed(self.user)
+        self.assertEqual(cache_stats()['feed'], {'hit': 1, 'miss': 1})
+
+        get_personalized_feed(self.author)
+        self.make_meme(self.author, "Own")
+        get_personalized_feed(self.author)
+        self.assertEqual(cache_stats()['feed'], {'hit': 1, 'miss': 3})
+
+    def test_follow_invalidates_suggestions(self):
+        Follow.objects.create(follower=self.author, following=self.third)
+        before = get_smart_suggestions(self.user)
+        self.assertNotIn(self.third, before)
+        Follow.objects.create(follower=self.user, following=self.author)
+        self.assertIn(self.third, get_smart_suggestions(self.user))
+
+    def test_like_invalidates_feed(self):
+        meme = self.make_meme(self.third, "Interest")
+        self.make_meme(self.author, "Other")
+        get_personalized_feed(self.user)
+        meme.faa_likes.add(self.user)
+        memes, _ = get_personalized_feed(self.user)
+        self.assertEqual(memes[0], meme)  # liked author moves up to the interest tier
+
+
+class AnonymousHomeCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='password')
+        self.fan = User.objects.create_user(username='fan', password='password')
+        self.meme = self.make_meme("First")
+
+    def make_meme(self, caption):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        return Meme.objects.create(author=self.author, image=image, caption=caption)
+
+    def test_repeat_visit_is_not_modified(self):
+        first = self.client.get(reverse('home'))
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+        self.assertTrue(first.has_header('Last-Modified'))
+
+        second = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(cache_stats()['anonhome'], {'hit': 0, 'miss': 1})
+
+    def test_rendered_feed_is_reused(self):
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'id="post-{self.meme.id}"')
+        self.assertEqual(cache_stats()['anonhome'], {'hit': 1, 'miss': 1})
+
+    def test_activity_changes_etag(self):
+        etag = self.client.get(reverse('home'))['ETag']
+
+        self.meme.faa_likes.add(self.fan)
+        liked = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(liked.status_code, 200)
+
+        fresh = self.make_meme("Second")
+        uploaded = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=liked['ETag'])
+        self.assertEqual(uploaded.status_code, 200)
+        self.assertContains(uploaded, f'id="post-{fresh.id}"')
+
+    def test_logged_in_home_is_not_conditional(self):
+        self.client.login(username='fan', password='password')
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.has_header('ETag'))
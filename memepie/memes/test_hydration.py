@@ -0,0 +1,45 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .models import Meme, Comment
+from .hydration import hydrate_memes
+
+class FeedHydrationTest(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+
+    def make_memes(self, count):
+        for i in range(count):
+            image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+            meme = Meme.objects.create(author=self.author, image=image, caption=f"Meme {i}")
+            meme.faa_likes.add(self.viewer)
+            comment = Comment.objects.create(meme=meme, author=self.author, content="Top")
+            reply = Comment.objects.create(meme=meme, author=self.viewer, content="Reply", parent=comment)
+            reply.likes.add(self.author)
+
+    def test_hydrated_attributes(self):
+        self.make_memes(1)
+        meme = hydrate_memes(Meme.objects.all(), self.viewer)[0]
+        self.assertEqual(meme.likes_count, 1)
+        self.assertEqual(meme.comments_count, 2)
+        self.assertTrue(meme.viewer_liked)
+        self.assertEqual(len(meme.comment_thread), 1)
+        reply = meme.comment_thread[0].reply_list[0]
+        self.assertEqual(reply.likes_count, 1)
+        self.assertFalse(reply.viewer_liked)
+
+    def count_home_queries(self):
+        self.client.login(username='viewer', password='password')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('home'))
+        return len(queries)
+
+    def test_home_query_count_does_not_grow_with_page(self):
+        self.make_memes(2)
+        small_page = self.count_home_queries()
+        self.make_memes(6)
+        self.assertEqual(self.count_home_queries(), small_page)
@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from .media_jobs import run_pending
+from .models import Meme
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_jpeg(name='big.jpg', size=(2400, 1600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_JOBS_EAGER=False)
+class ImageVariantTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='password')
+        self.client.force_login(self.user)
+
+    def open_variant(self, name):
+        with default_storage.open(name) as f:
+            image = Image.open(f)
+            image.load()
+            return image
+
+    def test_upload_generates_meme_variants(self):
+        self.client.post(reverse('upload_meme'), {'image': make_jpeg(), 'caption': "big"})
+        run_pending()
+        meme = Meme.objects.get()
+        self.assertEqual(set(meme.image_variants), {'thumb', 'thumb_webp', 'feed', 'feed_webp'})
+        self.assertEqual(self.open_variant(meme.image_variants['feed']).size, (1080, 720))
+        self.assertEqual(self.open_variant(meme.image_variants['thumb']).size, (320, 320))
+        self.assertEqual(self.open_variant(meme.image_variants['feed_webp']).format, 'WEBP')
+        self.assertTrue(meme.feed_url.endswith('_feed.jpg'))
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, meme.feed_webp_url)
+        self.assertNotContains(response, meme.image.url)
+
+    def test_unreadable_images_fall_back_to_the_original(self):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        meme = Meme.objects.create(author=self.user, image=image, caption="tiny")
+        call_command('build_image_variants', stdout=StringIO())
+        meme.refresh_from_db()
+        self.assertEqual(meme.image_variants, {})
+        self.assertEqual(meme.feed_url, meme.image.url)
+        self.assertIsNone(meme.feed_webp_url)
+
+    def test_profile_pictures_get_an_avatar(self):
+        self.client.post(reverse('profile_edit'), {
+            'username': 'uploader', 'email': 'uploader@example.com', 'profile_pic': make_jpeg('me.jpg'),
+        })
+        profile = User.objects.get(username='uploader').profile
+        # Processed by the media queue; until then the original is shown
+        self.assertEqual(profile.avatar_url, profile.profile_pic.url)
+        run_pending()
+        profile.refresh_from_db()
+        self.assertEqual(self.open_variant(profile.profile_pic_variants['avatar']).size, (160, 160))
+        self.assertTrue(profile.avatar_url.endswith('_avatar.jpg'))
+        old_avatar = profile.profile_pic_variants['avatar']
+
+        self.client.post(reverse('profile_edit'), {
+            'username': 'uploader', 'email': 'uploader@example.com', 'profile_pic': make_jpeg('again.jpg'),
+        })
+        run_pending()
+        self.assertFalse(default_storage.exists(old_avatar))
+
+    def test_backfill_command(self):
+        meme = Meme.objects.create(author=self.user, image=make_jpeg(), caption="old")
+        self.assertEqual(meme.image_variants, {})
+        out = StringIO()
+        call_command('build_image_variants', stdout=out)
+        meme.refresh_from_db()
+        self.assertEqual(len(meme.image_variants), 4)
+        self.assertIn("Generated variants for 1 image(s).", out.getvalue())
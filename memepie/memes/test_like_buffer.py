@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from .models import Meme, Notification
+from .like_buffer import like_buffer
+
+@override_settings(LIKE_BUFFER_FLUSH_INTERVAL=60, LIKE_BUFFER_MAX_PENDING=100)
+class LikeBufferTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='password') for i in range(3)]
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        self.meme = Meme.objects.create(author=self.author, image=image, caption="Viral")
+        self.url = reverse('like_meme', args=[self.meme.id])
+
+    def tearDown(self):
+        like_buffer.flush()
+
+    def click(self, user):
+        self.client.force_login(user)
+        return self.client.get(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+    def test_clicks_are_buffered_with_optimistic_counts(self):
+        self.assertEqual(self.click(self.fans[0]), {'liked': True, 'total_likes': 1})
+        self.assertEqual(self.click(self.fans[1]), {'liked': True, 'total_likes': 2})
+        self.assertFalse(self.meme.faa_likes.exists())
+
+        self.assertEqual(like_buffer.flush(), 2)
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 2)
+        self.assertEqual(set(self.meme.faa_likes.all()), set(self.fans[:2]))
+        self.assertEqual(Notification.objects.get(recipient=self.author, notification_type='like').actor_count, 2)
+
+    def test_repeated_toggles_collapse(self):
+        self.meme.faa_likes.add(self.fans[2])
+        for _ in range(3):
+            self.click(self.fans[0])
+        self.assertEqual(self.click(self.fans[1]), {'liked': True, 'total_likes': 3})
+        self.assertEqual(self.click(self.fans[1]), {'liked': False, 'total_likes': 2})
+        self.assertEqual(self.click(self.fans[2]), {'liked': False, 'total_likes': 1})
+
+        self.assertEqual(like_buffer.flush(), 2)  # fan0 liked, fan2 unliked, fan1 cancelled out
+        self.assertEqual(list(self.meme.faa_likes.all()), [self.fans[0]])
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.likes_count, 1)
+
+    def test_failed_flush_keeps_the_batch(self):
+        self.click(self.fans[0])
+        self.click(self.fans[1])
+        with mock.patch.object(like_buffer, '_write', side_effect=RuntimeError("database went away")):
+            with self.assertLogs('memes.like_buffer', 'ERROR'):
+                self.assertEqual(like_buffer.flush(), 0)
+        self.assertFalse(self.meme.faa_likes.exists())
+        self.assertEqual(self.click(self.fans[2]), {'liked': True, 'total_likes': 3})
+
+        self.assertEqual(like_buffer.flush(), 3)
+        self.assertEqual(set(self.meme.faa_likes.all()), set(self.fans))
+
+    @override_settings(LIKE_BUFFER_MAX_PENDING=2)
+    def test_full_buffer_flushes(self):
+        self.click(self.fans[0])
+        self.click(self.fans[1])
+        self.assertEqual(self.meme.faa_likes.count(), 2)
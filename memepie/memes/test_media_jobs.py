@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from .media_jobs import claim_jobs, enqueue, run_pending
+from .models import MediaJob, Meme
+from .test_image_variants import make_jpeg
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_JOBS_EAGER=False, MEDIA_JOB_MAX_ATTEMPTS=3, MEDIA_JOB_RETRY_SECONDS=10)
+class MediaJobTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='password')
+        self.client.force_login(self.user)
+
+    def upload(self):
+        self.client.post(reverse('upload_meme'), {'image': make_jpeg(), 'caption': "queued"})
+        return Meme.objects.get()
+
+    def test_upload_only_queues_processing(self):
+        meme = self.upload()
+        self.assertEqual(meme.media_status, 'pending')
+        self.assertEqual(meme.image_variants, {})
+        self.assertEqual(meme.media_job.status, 'pending')
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Processing…')
+        self.assertNotContains(response, meme.image.url)
+
+        self.assertEqual(run_pending(), 1)
+        meme.refresh_from_db()
+        self.assertEqual(meme.media_status, 'ready')
+        self.assertIn('feed', meme.image_variants)
+        self.assertEqual(meme.media_job.status, 'done')
+        self.assertEqual(meme.media_job.attempts, 1)
+        self.assertContains(self.client.get(reverse('home')), meme.feed_url)
+        self.assertEqual(run_pending(), 0)
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        meme = self.upload()
+        with mock.patch('memes.media_jobs.process_meme', side_effect=OSError("disk full")):
+            self.assertEqual(run_pending(), 1)
+            job = MediaJob.objects.get()
+            self.assertEqual(job.status, 'pending')
+            self.assertIn("disk full", job.last_error)
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=9))
+            # Not due yet
+            self.assertEqual(run_pending(), 0)
+
+            for attempt in (2, 3):
+                MediaJob.objects.update(run_after=timezone.now())
+                self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        meme.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertEqual(meme.media_status, 'failed')
+        self.assertNotContains(self.client.get(reverse('home')), 'Processing…')
+
+    def test_stale_running_jobs_are_claimed_again(self):
+        meme = self.upload()
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+        with override_settings(MEDIA_JOB_TIMEOUT=60):
+            MediaJob.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(claim_jobs(10), [meme.media_job.id])
+
+    @override_settings(MEDIA_JOBS_EAGER=True)
+    def test_eager_mode_processes_inside_the_request(self):
+        meme = self.upload()
+        self.assertEqual(meme.media_status, 'ready')
+        self.assertIn('thumb', meme.image_variants)
+
+    def test_worker_command(self):
+        meme = self.upload()
+        enqueue(Meme.objects.create(author=self.user, image=make_jpeg(), caption="second"))
+        out = StringIO()
+        call_command('process_media', workers=0, once=True, stdout=out)
+        self.assertIn("Processed 2 media job(s).", out.getvalue())
+        self.assertFalse(Meme.objects.exclude(media_status='ready').exists())
+        meme.refresh_from_db()
+        self.assertIn('feed_webp', meme.image_variants)
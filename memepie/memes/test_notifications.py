@@ -0,0 +1,108 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Meme, Notification
+from .like_buffer import like_buffer
+from .notifications import Event, notify, mark_seen, unread_count
+
+class NotificationGroupingTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='password') for i in range(3)]
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        self.meme = Meme.objects.create(author=self.author, image=image, caption="Popular")
+
+    def like(self, fan):
+        return Event(self.author.id, fan.id, 'like', self.meme.id, f"{fan.username} liked your meme")
+
+    def test_likes_fold_into_one_row(self):
+        notify([self.like(self.fans[0]), self.like(self.fans[1])])
+        notify([self.like(self.fans[2])])
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.sender, self.fans[2])
+
+    def test_repeat_actor_is_not_counted_or_resurfaced(self):
+        notify([self.like(self.fans[0])])
+        mark_seen(self.author, Notification.objects.get().updated_at)
+        notify([self.like(self.fans[0]), self.like(self.fans[0])])
+        self.assertEqual(Notification.objects.get().actor_count, 1)
+        self.assertEqual(unread_count(self.author), 0)
+
+    def test_new_actor_resurfaces_read_group(self):
+        notify([self.like(self.fans[0])])
+        mark_seen(self.author, Notification.objects.get().updated_at)
+        notify([self.like(self.fans[1])])
+        self.assertEqual(unread_count(self.author), 1)
+
+    def test_groups_are_per_type_and_meme(self):
+        notify([
+            self.like(self.fans[0]),
+            Event(self.author.id, self.fans[0].id, 'comment', self.meme.id, "fan0 commented: hi..."),
+            Event(self.author.id, self.fans[0].id, 'follow', None, "fan0 started following you"),
+            Event(self.author.id, self.author.id, 'like', self.meme.id, "self like"),
+        ])
+        self.assertEqual(Notification.objects.count(), 3)
+
+    @override_settings(LIKE_BUFFER_FLUSH_INTERVAL=0)
+    def test_like_toggling_does_not_duplicate(self):
+        self.client.login(username='fan0', password='password')
+        url = reverse('like_meme', args=[self.meme.id])
+        for _ in range(3):
+            self.client.get(url)
+        self.assertEqual(Notification.objects.get().actor_count, 1)
+        like_buffer.flush()
+
+    def test_page_shows_aggregate(self):
+        notify([self.like(fan) for fan in self.fans])
+        self.client.login(username='author', password='password')
+        response = self.client.get(reverse('notifications'))
+        self.assertContains(response, '@fan2')
+        self.assertContains(response, 'and 2 others')
+        self.assertContains(response, '<title>Notifications - MemePie</title>', html=True)
+        self.assertContains(response, "addEventListener('memepie:notification'", count=1)
+
+
+@override_settings(NOTIFICATIONS_PAGE_SIZE=2)
+class NotificationPageTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.followers = [User.objects.create_user(username=f'follower{i}', password='password') for i in range(3)]
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        self.meme = Meme.objects.create(author=self.user, image=image, caption="Mine")
+        notify([Event(self.user.id, self.followers[0].id, 'follow', None, "follower0 started following you")])
+        notify([Event(self.user.id, self.followers[1].id, 'like', self.meme.id, "follower1 liked your meme")])
+        notify([Event(self.user.id, self.followers[2].id, 'comment', self.meme.id, "follower2 commented: hi...")])
+        self.client.login(username='reader', password='password')
+
+    def test_pages_and_watermark(self):
+        self.assertEqual(unread_count(self.user), 3)
+        first = self.client.get(reverse('notifications'))
+        self.assertEqual([n.notification_type for n in first.context['notifications']], ['comment', 'like'])
+        self.assertTrue(all(n.is_unread for n in first.context['notifications']))
+        self.assertEqual(unread_count(self.user), 0)
+
+        second = self.client.get(reverse('notifications'), {'cursor': first.context['next_cursor']})
+        self.assertEqual([n.notification_type for n in second.context['notifications']], ['follow'])
+        self.assertIsNone(second.context['next_cursor'])
+
+        again = self.client.get(reverse('notifications'))
+        self.assertFalse(any(n.is_unread for n in again.context['notifications']))
+
+    def count_page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('notifications'))
+        return len(queries)
+
+    def test_page_cost_does_not_grow_with_history(self):
+        self.client.get(reverse('notifications'))
+        notify([Event(self.user.id, self.followers[0].id, 'comment', self.meme.id, "follower0 commented: again...")])
+        baseline = self.count_page_queries()
+        for i in range(10):
+            fan = User.objects.create_user(username=f'fan{i}')
+            notify([Event(self.user.id, fan.id, 'like', self.meme.id, "new like")])
+            notify([Event(self.user.id, fan.id, 'follow', None, "new follower")])
+        self.assertEqual(self.count_page_queries(), baseline)
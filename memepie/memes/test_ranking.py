@@ -0,0 +1,50 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User, AnonymousUser
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from io import StringIO
+from .models import Meme
+from .ranking import hot_score, HOT_DECAY_SECONDS
+from .views import get_personalized_feed
+
+class HotRankingTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password')
+        self.fans = [User.objects.create(username=f'fan{i}') for i in range(10)]
+
+    def make_meme(self, caption, age=timedelta(0)):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        meme = Meme.objects.create(author=self.author, image=image, caption=caption)
+        if age:
+            Meme.objects.filter(id=meme.id).update(created_at=meme.created_at - age)
+            call_command('rank_memes', stdout=StringIO())
+            meme.refresh_from_db()
+        return meme
+
+    def test_score_decays_with_age(self):
+        old = self.make_meme("Old viral", age=timedelta(days=7))
+        old.faa_likes.add(*self.fans)
+        fresh = self.make_meme("Fresh")
+        old.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertGreater(fresh.hot_score, old.hot_score)
+
+    def test_likes_rescore_incrementally(self):
+        meme = self.make_meme("Liked")
+        before = Meme.objects.get(id=meme.id).hot_score
+        meme.faa_likes.add(*self.fans)
+        after = Meme.objects.get(id=meme.id).hot_score
+        self.assertAlmostEqual(after - before, 1.0)  # 10 likes = one decade of engagement
+
+    def test_ten_times_engagement_offsets_one_decay_period(self):
+        now = self.make_meme("Now").created_at
+        earlier = now - timedelta(seconds=HOT_DECAY_SECONDS)
+        self.assertAlmostEqual(hot_score(10, 0, earlier), hot_score(1, 0, now))
+
+    def test_anonymous_feed_reads_hot_order(self):
+        old = self.make_meme("Old", age=timedelta(days=2))
+        new = self.make_meme("New")
+        new.faa_likes.add(self.fans[0])
+        memes, _ = get_personalized_feed(AnonymousUser())
+        self.assertEqual(memes[:2], [new, old])
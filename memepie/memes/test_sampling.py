@@ -0,0 +1,39 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .sampling import sample, sample_ids
+
+class SamplingTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}') for i in range(20)]
+
+    def test_sample_is_distinct_and_respects_exclusions(self):
+        excluded = {user.id for user in self.users[:15]}
+        for _ in range(10):
+            ids = sample_ids(User.objects.all(), 4, exclude=excluded)
+            self.assertEqual(len(ids), 4)
+            self.assertEqual(len(set(ids)), 4)
+            self.assertFalse(set(ids) & excluded)
+
+    def test_sample_returns_everything_available(self):
+        excluded = {user.id for user in self.users[:18]}
+        picked = sample(User.objects.all(), 5, exclude=excluded)
+        self.assertEqual(set(picked), set(self.users[18:]))
+
+    def test_sparse_ids_and_filtered_querysets(self):
+        User.objects.filter(id__in=[user.id for user in self.users[1:-1]]).delete()
+        self.assertEqual(set(sample_ids(User.objects.all(), 2)), {self.users[0].id, self.users[-1].id})
+        staff = self.users[0]
+        staff.is_staff = True
+        staff.save()
+        self.assertEqual(sample(User.objects.filter(is_staff=True), 3), [staff])
+
+    def test_never_sorts_randomly(self):
+        with CaptureQueriesContext(connection) as queries:
+            sample(User.objects.all(), 5)
+        self.assertFalse(any('RANDOM' in query['sql'].upper() for query in queries.captured_queries))
+
+    def test_empty_queryset(self):
+        self.assertEqual(sample_ids(User.objects.none(), 3), [])
+        self.assertEqual(sample_ids(User.objects.all(), 0), [])
@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from io import StringIO
+from .models import Meme
+from .search import search_memes, search_users, MEME_TABLE
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='pie_baker', password='password', first_name='Crusty', last_name='Dough')
+        self.other = User.objects.create_user(username='cake_fan', password='password')
+        self.cats = self.make_meme("cat cat cat everywhere")
+        self.cat_dog = self.make_meme("a cat and a dog walk into a bar")
+        self.dog = self.make_meme("just a dog")
+
+    def make_meme(self, caption):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        return Meme.objects.create(author=self.author, image=image, caption=caption)
+
+    def test_memes_are_ranked_by_relevance(self):
+        memes, has_next = search_memes("cat")
+        self.assertEqual(memes, [self.cats, self.cat_dog])
+        self.assertFalse(has_next)
+        self.assertEqual(search_memes("cat dog")[0], [self.cat_dog])
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(search_memes("every")[0], [self.cats])
+        self.assertEqual(search_users("crus")[0], [self.author])
+        self.assertEqual(search_users("bak")[0], [self.author])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.dog.caption = "just a hamster"
+        self.dog.save()
+        self.assertEqual(search_memes("hamster")[0], [self.dog])
+        self.assertEqual(search_memes("dog")[0], [self.cat_dog])
+        self.cat_dog.delete()
+        self.assertEqual(search_memes("dog")[0], [])
+
+        self.other.username = 'pie_eater'
+        self.other.save()
+        self.assertEqual(set(search_users("pie")[0]), {self.author, self.other})
+
+    def test_pages(self):
+        first, has_next = search_memes("a", page_size=1)
+        second, more = search_memes("a", page_size=1, page=2)
+        self.assertTrue(has_next)
+        self.assertFalse(more)
+        self.assertNotEqual(first, second)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {MEME_TABLE}')
+        self.assertEqual(search_memes("cat")[0], [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertEqual(search_memes("cat")[0], [self.cats, self.cat_dog])
+        self.assertIn("Indexed 3 meme(s)", out.getvalue())
+
+    @override_settings(SEARCH_PAGE_SIZE=1)
+    def test_search_view(self):
+        response = self.client.get(reverse('search'), {'q': 'dog'})
+        self.assertEqual(len(response.context['memes']), 1)
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get(reverse('search'), {'q': 'pie', 'page': 'x'})
+        self.assertEqual(list(response.context['users']), [self.author])
@@ -0,0 +1,138 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .models import Follow, Meme, Suggestion
+from .suggestions import build_suggestions, ranked_suggestion_ids, score_user
+from .views import get_smart_suggestions
+
+class SuggestionEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {name: User.objects.create_user(username=name) for name in 'abcdef'}
+
+    def follow(self, follower, following):
+        Follow.objects.create(follower=self.users[follower], following=self.users[following])
+
+    def make_meme(self):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        return Meme.objects.create(author=self.users['f'], image=image, caption="Meme")
+
+    def suggested(self, name):
+        usernames = dict(User.objects.values_list('id', 'username'))
+        return [usernames[pk] for pk in ranked_suggestion_ids(self.users[name].id)]
+
+    def test_build_ranks_by_shared_connections(self):
+        # a follows b and c; both follow d, only b follows e
+        for follower, following in [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('b', 'e')]:
+            self.follow(follower, following)
+        build_suggestions()
+        self.assertEqual(self.suggested('a'), ['d', 'e'])
+
+    def test_build_excludes_self_and_followed(self):
+        # b is both followed and a friend-of-friend through c
+        for follower, following in [('a', 'b'), ('a', 'c'), ('c', 'b'), ('b', 'a')]:
+            self.follow(follower, following)
+        build_suggestions()
+        self.assertFalse(Suggestion.objects.filter(user=self.users['a']).exists())
+        self.assertEqual(self.suggested('b'), ['c'])
+
+    def test_build_keeps_top_k(self):
+        for name in 'bcde':
+            self.follow('a', name)
+            self.follow(name, 'f')
+        self.make_meme().faa_likes.add(self.users['b'], self.users['c'])
+        build_suggestions(top_k=1, batch_size=2)
+        self.assertEqual(Suggestion.objects.filter(user=self.users['b']).count(), 1)
+        self.assertEqual(self.suggested('a'), ['f'])
+
+    def test_live_scores_match_build(self):
+        for follower, following in [('a', 'b'), ('b', 'c'), ('b', 'd')]:
+            self.follow(follower, following)
+        meme = self.make_meme()
+        meme.faa_likes.add(self.users['a'], self.users['e'])
+        live = score_user(self.users['a'].id)
+        build_suggestions()
+        built = dict(Suggestion.objects.filter(user=self.users['a']).values_list('suggested_id', 'score'))
+        self.assertEqual(live.keys(), built.keys())
+        for user_id, score in live.items():
+            self.assertAlmostEqual(score, built[user_id], places=4)
+
+    def test_views_read_precomputed_order(self):
+        for follower, following in [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('b', 'e')]:
+            self.follow(follower, following)
+        build_suggestions()
+        self.assertEqual(get_smart_suggestions(self.users['a'], limit=2), [self.users['d'], self.users['e']])
+
+
+class IncrementalSuggestionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {name: User.objects.create_user(username=name) for name in 'abcdef'}
+        # Everyone starts with at least one precomputed candidate
+        for follower, following in [('a', 'b'), ('b', 'c'), ('c', 'd'), ('d', 'e'), ('e', 'f'), ('f', 'a')]:
+            self.follow(follower, following)
+        build_suggestions()
+
+    def follow(self, follower, following):
+        return Follow.objects.create(follower=self.users[follower], following=self.users[following])
+
+    def rankings(self):
+        return {name: ranked_suggestion_ids(user.id) for name, user in self.users.items()}
+
+    def assert_matches_rebuild(self):
+        incremental = self.rankings()
+        build_suggestions()
+        self.assertEqual(incremental, self.rankings())
+
+    def test_follow_updates_both_sides(self):
+        self.follow('b', 'e')
+        self.assertIn(self.users['f'].id, ranked_suggestion_ids(self.users['b'].id))
+        self.assertIn(self.users['e'].id, ranked_suggestion_ids(self.users['a'].id))
+        self.assert_matches_rebuild()
+
+    def test_unfollow_reverts_scores(self):
+        self.follow('b', 'e')
+        Follow.objects.filter(follower=self.users['b'], following=self.users['e']).delete()
+        self.assertNotIn(self.users['f'].id, ranked_suggestion_ids(self.users['b'].id))
+        self.assert_matches_rebuild()
+
+    def test_unfollowed_account_becomes_candidate_again(self):
+        self.follow('a', 'c')
+        self.assertNotIn(self.users['c'].id, ranked_suggestion_ids(self.users['a'].id))
+        Follow.objects.filter(follower=self.users['a'], following=self.users['c']).delete()
+        self.assertEqual(ranked_suggestion_ids(self.users['a'].id)[0], self.users['c'].id)
+        self.assert_matches_rebuild()
+
+    def test_likes_add_and_remove_co_likers(self):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        meme = Meme.objects.create(author=self.users['f'], image=image, caption="Meme")
+        meme.faa_likes.add(self.users['a'])
+        self.users['d'].liked_memes.add(meme)
+        self.assertIn(self.users['d'].id, ranked_suggestion_ids(self.users['a'].id))
+        self.assertIn(self.users['a'].id, ranked_suggestion_ids(self.users['d'].id))
+
+        meme.faa_likes.remove(self.users['d'])
+        self.assertNotIn(self.users['d'].id, ranked_suggestion_ids(self.users['a'].id))
+        self.assert_matches_rebuild()
+
+    def test_likes_added_together_are_counted_once(self):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        meme = Meme.objects.create(author=self.users['f'], image=image, caption="Meme")
+        a, c, e = self.users['a'], self.users['c'], self.users['e']
+        meme.faa_likes.add(a, c, e)
+        stored = dict(Suggestion.objects.filter(user=a).values_list('suggested_id', 'score'))
+        live = score_user(a.id)
+        self.assertAlmostEqual(stored[c.id], live[c.id], places=5)
+        self.assertAlmostEqual(stored[e.id], live[e.id], places=5)
+
+        meme.faa_likes.remove(c, e)
+        stored = dict(Suggestion.objects.filter(user=a).values_list('suggested_id', 'score'))
+        self.assertNotIn(e.id, stored)
+        self.assert_matches_rebuild()
+
+    def test_cached_suggestions_refresh(self):
+        before = get_smart_suggestions(self.users['b'])
+        self.assertNotIn(self.users['f'], before)
+        self.follow('e', 'b')  # e's followers (d) now reach b
+        self.assertIn(self.users['b'], get_smart_suggestions(self.users['d']))
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .models import Follow, Meme, PendingFanOut, TimelineEntry
+from .views import get_personalized_feed
+
+class TimelineFanOutTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.client.login(username='reader', password='password')
+
+    def make_meme(self, caption="Meme"):
+        image = SimpleUploadedFile('test.gif', b'\x47\x49\x46\x20\x01', content_type='image/gif')
+        return Meme.objects.create(author=self.author, image=image, caption=caption)
+
+    def test_follow_backfills_recent_memes(self):
+        old_meme = self.make_meme("Old")
+        self.client.get(reverse('toggle_follow', args=['author']), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, meme=old_meme).exists())
+
+    def test_new_meme_fans_out_to_followers(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        meme = self.make_meme("Fresh")
+        entry = TimelineEntry.objects.get(user=self.reader, meme=meme)
+        self.assertEqual(entry.created_at, meme.created_at)
+
+    def test_unfollow_removes_author_from_timeline(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        self.make_meme()
+        self.client.get(reverse('toggle_follow', args=['author']), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+
+    @override_settings(TIMELINE_FANOUT_SYNC_LIMIT=0)
+    def test_large_audiences_fan_out_after_commit(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            meme = self.make_meme()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(TimelineEntry.objects.filter(meme=meme).exists())
+        self.assertTrue(PendingFanOut.objects.filter(meme=meme).exists())
+
+        # The process died before the thread ran: the scheduled command picks it up
+        out = StringIO()
+        call_command('fan_out_timelines', min_age=0, stdout=out)
+        self.assertIn("Finished 1 pending fan-out(s).", out.getvalue())
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, meme=meme).exists())
+        self.assertFalse(PendingFanOut.objects.exists())
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=1, FEED_PAGE_SIZE=10)
+    def test_memes_beyond_the_backfill_still_reach_the_feed(self):
+        older, newer = self.make_meme("Older"), self.make_meme("Newer")
+        Follow.objects.create(follower=self.reader, following=self.author)
+        self.assertEqual(list(TimelineEntry.objects.values_list('meme', flat=True)), [newer.id])
+        memes, _ = get_personalized_feed(self.reader)
+        self.assertEqual(memes, [newer, older])
+
+        # Even an empty timeline (e.g. never rebuilt) leaves followed memes in the fallback tier
+        TimelineEntry.objects.all().delete()
+        memes, _ = get_personalized_feed(self.reader)
+        self.assertEqual(set(memes), {older, newer})
+
+
+class TimelineMigrationTest(TransactionTestCase):
+    def test_existing_follows_are_backfilled(self):
+        executor = MigrationExecutor(connection)
+        before, after = [('memes', '0005_alter_comment_id_alter_follow_id_alter_meme_id_and_more')], [('memes', '0006_timelineentry')]
+        executor.migrate(before)
+        apps = executor.loader.project_state(before).apps
+        User_, Meme_, Follow_ = (apps.get_model(*name) for name in (('auth', 'User'), ('memes', 'Meme'), ('memes', 'Follow')))
+        reader, author = User_.objects.create(username='reader'), User_.objects.create(username='author')
+        meme = Meme_.objects.create(author=author, image='memes/x.gif', caption="Before")
+        Follow_.objects.create(follower=reader, following=author)
+
+        executor.loader.build_graph()
+        executor.migrate(after)
+        apps = executor.loader.project_state(after).apps
+        entries = apps.get_model('memes', 'TimelineEntry').objects.values_list('user_id', 'meme_id')
+        self.assertEqual(list(entries), [(reader.id, meme.id)])
+
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .models import Follow
+from .typeahead import TypeaheadIndex, typeahead
+
+
+class TypeaheadTest(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='password')
+        self.popular = User.objects.create_user(username='sam_popular', password='password')
+        self.friend = User.objects.create_user(username='samwise', password='password', first_name='Sam', last_name='Gamgee')
+        self.other = User.objects.create_user(username='samantha', password='password')
+        for fan in range(3):
+            Follow.objects.create(follower=User.objects.create_user(username=f'fan{fan}'), following=self.popular)
+        Follow.objects.create(follower=self.viewer, following=self.friend)
+        typeahead.build()
+
+    def usernames(self, prefix, viewer=None):
+        return [u['username'] for u in typeahead.search(prefix, viewer.id if viewer else None)]
+
+    def test_followed_then_popular_first(self):
+        self.assertEqual(self.usernames('sam', self.viewer), ['samwise', 'sam_popular', 'samantha'])
+        self.assertEqual(self.usernames('sam'), ['sam_popular', 'samwise', 'samantha'])
+
+    def test_matches_names(self):
+        self.assertEqual(self.usernames('gam'), ['samwise'])
+        self.assertEqual(self.usernames('sam gam'), ['samwise'])
+        self.assertEqual(self.usernames('zzz'), [])
+        self.assertEqual(self.usernames('  '), [])
+
+    def test_lookups_do_not_query(self):
+        with self.assertNumQueries(0):
+            typeahead.search('sam', self.viewer.id)
+
+    def test_stale_index_refreshes_in_the_background(self):
+        index = TypeaheadIndex()
+        with mock.patch.object(index, 'refresh_in_background') as refresh, self.assertNumQueries(0):
+            self.assertEqual(index.search('sam'), [])
+        refresh.assert_called_once()
+
+        with override_settings(TYPEAHEAD_REFRESH_SECONDS=0):
+            with mock.patch.object(typeahead, 'refresh_in_background') as refresh, self.assertNumQueries(0):
+                self.assertEqual(len(typeahead.search('sam')), 3)
+            refresh.assert_called_once()
+
+    def test_one_rebuild_at_a_time(self):
+        index = TypeaheadIndex()
+        index._build_lock.acquire()
+        with mock.patch('memes.typeahead.threading.Thread') as thread:
+            index.refresh_in_background()
+        thread.assert_not_called()
+        index._build_lock.release()
+
+    def test_updates_incrementally(self):
+        newcomer = User.objects.create_user(username='samuel', password='password')
+        self.assertIn('samuel', self.usernames('samu'))
+        newcomer.username = 'bob'
+        newcomer.save()
+        self.assertEqual(self.usernames('samu'), [])
+        self.assertEqual(self.usernames('bob'), ['bob'])
+
+        Follow.objects.create(follower=self.viewer, following=self.other)
+        self.assertEqual(self.usernames('sam', self.viewer)[:2], ['samantha', 'samwise'])
+        Follow.objects.filter(follower=self.viewer, following=self.other).delete()
+        self.assertEqual(self.usernames('sam', self.viewer)[0], 'samwise')
+
+    def test_endpoint(self):
+        self.client.force_login(self.viewer)
+        users = self.client.get(reverse('user_typeahead'), {'q': 'samw'}).json()['users']
+        self.assertEqual(users[0]['username'], 'samwise')
+        self.assertEqual(users[0]['name'], 'Sam Gamgee')
+        self.assertTrue(users[0]['profile_pic_url'].endswith('default.jpg'))
@@ -0,0 +1,96 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .feed_cache import bump_user_versions
+from .models import Follow, Meme, PendingFanOut, TimelineEntry
+
+
+def _in_background(func, *args):
+    # Start once the row is committed so the worker's own connection can see it
+    def run():
+        try:
+            func(*args)
+        finally:
+            connection.close()
+
+    transaction.on_commit(lambda: threading.Thread(target=run, daemon=True).start())
+
+
+def _write_entries(meme, follower_ids):
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    entries = [
+        TimelineEntry(user_id=follower_id, meme_id=meme.id, author_id=meme.author_id, created_at=meme.created_at)
+        for follower_id in follower_ids
+    ]
+    for start in range(0, len(entries), batch_size):
+        TimelineEntry.objects.bulk_create(entries[start:start + batch_size], ignore_conflicts=True)
+        # Cached feeds of these followers are now missing the meme
+        bump_user_versions(follower_ids[start:start + batch_size])
+
+
+def _fan_out(meme_id):
+    meme = Meme.objects.filter(id=meme_id).first()
+    if meme is None:
+        return
+    follower_ids = Follow.objects.filter(following_id=meme.author_id).values_list('follower_id', flat=True)
+    _write_entries(meme, list(follower_ids))
+
+
+def _finish_pending(meme_id):
+    _fan_out(meme_id)
+    PendingFanOut.objects.filter(meme_id=meme_id).delete()
+
+
+def fan_out_meme(meme):
+    """Push a newly posted meme into every follower's timeline."""
+    follower_count = Follow.objects.filter(following_id=meme.author_id).count()
+    if follower_count == 0:
+        return
+    if follower_count > settings.TIMELINE_FANOUT_SYNC_LIMIT:
+        # Big audiences would stall the upload request, so write them off the request thread.
+        # The pending row outlives the thread: if the process exits first, fan_out_timelines finishes it.
+        PendingFanOut.objects.create(meme=meme)
+        _in_background(_finish_pending, meme.id)
+    else:
+        _fan_out(meme.id)
+
+
+def fan_out_pending(min_age=0):
+    """
+    Finish background fan-outs queued at least `min_age` seconds ago (so ones
+    still running in their upload's process are left alone). Writing an
+    entry twice is harmless. Returns the number finished.
+    """
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    meme_ids = list(PendingFanOut.objects.filter(created_at__lte=cutoff).order_by('created_at').values_list('meme_id', flat=True))
+    for meme_id in meme_ids:
+        _finish_pending(meme_id)
+    return len(meme_ids)
+
+
+def backfill_author(follower_id, author_id):
+    """Copy an author's recent memes into a new follower's timeline."""
+    recent = Meme.objects.filter(author_id=author_id).order_by('-created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=follower_id, meme_id=meme.id, author_id=author_id, created_at=meme.created_at)
+        for meme in recent
+    ], ignore_conflicts=True)
+
+
+def remove_author(follower_id, author_id):
+    TimelineEntry.objects.filter(user_id=follower_id, author_id=author_id).delete()
+
+
+def rebuild_timeline(user):
+    """Recreate a user's timeline from scratch out of their current follows."""
+    TimelineEntry.objects.filter(user=user).delete()
+    for author_id in Follow.objects.filter(follower=user).values_list('following_id', flat=True):
+        backfill_author(user.id, author_id)
+
+
+def timeline_queryset(user):
+    return TimelineEntry.objects.filter(user=user).select_related('meme')
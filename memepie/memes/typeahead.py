@@ -0,0 +1,192 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from accounts.models import Profile
+from .models import Follow
+
+DEFAULT_PROFILE_PIC = Profile._meta.get_field('profile_pic').default
+
+
+class TypeaheadIndex:
+    """
+    In-process prefix index over usernames and display names. Every user
+    contributes a few lowercase terms (username, first name, last name, full
+    name) to one sorted list of (term, user_id), so a prefix lookup is a
+    bisect plus a short walk. The follow graph is held alongside so results
+    can put people the viewer follows, then popular accounts, first.
+
+    The index is built from the database by a background thread that the
+    WSGI/ASGI entry points start with the server, and rebuilt there every
+    TYPEAHEAD_REFRESH_SECONDS (so changes made by other workers show up);
+    each build is swapped in whole under the lock, and only one runs at a
+    time. In between, the receivers in models.py patch it. Lookups never
+    touch the database: a process that did not start the thread kicks off a
+    background build on its first lookup and returns no matches until it
+    lands.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # held for the whole of a rebuild
+        self._refresher = None
+        self._terms = []  # sorted (term, user_id)
+        self._users = {}  # user_id -> (username, display name, profile pic name or None for the default)
+        self._user_terms_by_id = {}  # user_id -> its entries in _terms
+        self._following = {}  # user_id -> set of followed user ids
+        self._followers = {}  # user_id -> follower count
+        self._built_at = None
+
+    def _user_terms(self, user_id, username, first_name, last_name):
+        terms = {username.lower(), f'{first_name} {last_name}'.strip().lower()}
+        terms.update(name.lower() for name in (first_name, last_name))
+        return [(term, user_id) for term in terms if term]
+
+    def build(self):
+        """Rebuild from the database and swap the result in; waits for a rebuild already running."""
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        profile_pics = {
+            user_id: (variants or {}).get('avatar') or pic
+            for user_id, pic, variants in User.objects.values_list(
+                'id', 'profile__profile_pic', 'profile__profile_pic_variants'
+            )
+        }
+        users, user_terms = {}, {}
+        for user_id, username, first_name, last_name in User.objects.values_list(
+            'id', 'username', 'first_name', 'last_name'
+        ).iterator():
+            users[user_id] = (username, f'{first_name} {last_name}'.strip(), profile_pics.get(user_id))
+            user_terms[user_id] = self._user_terms(user_id, username, first_name, last_name)
+        terms = sorted(term for entries in user_terms.values() for term in entries)
+        following, followers = {}, {}
+        for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id').iterator():
+            following.setdefault(follower_id, set()).add(following_id)
+            followers[following_id] = followers.get(following_id, 0) + 1
+        with self._lock:
+            self._terms, self._users, self._user_terms_by_id = terms, users, user_terms
+            self._following, self._followers = following, followers
+            self._built_at = time.monotonic()
+
+    def _build_in_background(self):
+        try:
+            self._build()
+        finally:
+            self._build_lock.release()
+            connection.close()
+
+    def refresh_in_background(self):
+        """Start a rebuild on another thread unless one is already running."""
+        if self._build_lock.acquire(blocking=False):
+            threading.Thread(target=self._build_in_background, daemon=True).start()
+
+    def _refresh_forever(self):
+        while True:
+            if self._build_lock.acquire(blocking=False):
+                self._build_in_background()
+            time.sleep(settings.TYPEAHEAD_REFRESH_SECONDS)
+
+    def start(self):
+        """Build now and every TYPEAHEAD_REFRESH_SECONDS, on a background thread."""
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_forever, daemon=True)
+        self._refresher.start()
+
+    def _ensure_fresh(self):
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > settings.TYPEAHEAD_REFRESH_SECONDS:
+            self.refresh_in_background()
+
+    def _drop_terms(self, user_id):
+        for term in self._user_terms_by_id.pop(user_id, ()):
+            i = bisect_left(self._terms, term)
+            if i < len(self._terms) and self._terms[i] == term:
+                del self._terms[i]
+
+    def update_user(self, user_id, username, first_name, last_name, profile_pic=None):
+        if self._built_at is None:
+            return
+        with self._lock:
+            if user_id in self._users:
+                if profile_pic is None:
+                    profile_pic = self._users[user_id][2]
+                self._drop_terms(user_id)
+            self._users[user_id] = (username, f'{first_name} {last_name}'.strip(), profile_pic)
+            self._user_terms_by_id[user_id] = self._user_terms(user_id, username, first_name, last_name)
+            for term in self._user_terms_by_id[user_id]:
+                insort(self._terms, term)
+
+    def update_profile_pic(self, user_id, profile_pic):
+        with self._lock:
+            if user_id in self._users:
+                username, name, _ = self._users[user_id]
+                self._users[user_id] = (username, name, profile_pic)
+
+    def remove_user(self, user_id):
+        with self._lock:
+            if user_id in self._users:
+                self._drop_terms(user_id)
+                del self._users[user_id]
+
+    def follow(self, follower_id, following_id, delta):
+        if self._built_at is None:
+            return
+        with self._lock:
+            followed = self._following.setdefault(follower_id, set())
+            if delta > 0:
+                followed.add(following_id)
+            else:
+                followed.discard(following_id)
+            self._followers[following_id] = max(self._followers.get(following_id, 0) + delta, 0)
+
+    def search(self, prefix, viewer_id=None, limit=8):
+        """
+        Users with a term starting with `prefix`: ones `viewer_id` follows
+        first, then by follower count, exact username matches breaking ties.
+        Returns a list of {'id', 'username', 'name', 'profile_pic_url'}.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._ensure_fresh()
+        with self._lock:
+            matches = set()
+            i = bisect_left(self._terms, (prefix,))
+            # Walk a bounded stretch: enough to rank well without scanning a huge prefix like "a"
+            while i < len(self._terms) and len(matches) < settings.TYPEAHEAD_SCAN_LIMIT:
+                term, user_id = self._terms[i]
+                if not term.startswith(prefix):
+                    break
+                if user_id != viewer_id:
+                    matches.add(user_id)
+                i += 1
+            followed = self._following.get(viewer_id, set())
+            ranked = sorted(matches, key=lambda user_id: (
+                user_id not in followed,
+                -self._followers.get(user_id, 0),
+                self._users[user_id][0].lower() != prefix,
+                self._users[user_id][0].lower(),
+            ))[:limit]
+            users = [(user_id, self._users[user_id]) for user_id in ranked]
+
+        return [
+            {
+                'id': user_id,
+                'username': username,
+                'name': name,
+                'profile_pic_url': default_storage.url(profile_pic or DEFAULT_PROFILE_PIC),
+            }
+            for user_id, (username, name, profile_pic) in users
+        ]
+
+
+typeahead = TypeaheadIndex()
@@ -1,65 +1,55 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from .models import Meme, Comment, Notification, Follow
+from .models import Meme, Comment, Notification, Follow, TimelineEntry
 from accounts.models import Block
 from .forms import MemeForm, CommentForm
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Count, Q
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+from .feed import paginate_tiers, InvalidCursor
+from .timeline import timeline_queryset
+from .hydration import hydrate_memes, hydrate_authors
+from .suggestions import ranked_suggestion_ids
+from .sampling import sample
+from .like_buffer import toggle_like
+from .search import search_memes, search_users
+from .typeahead import typeahead
+from .media_jobs import enqueue as enqueue_media
+from .duplicates import fingerprint_upload
+from .notifications import Event, notify, seen_at, mark_seen
+from .feed_cache import cached_feed_page, cached_suggestions, cached_anonymous_feed, content_version
 
 def get_smart_suggestions(user, limit=None):
     if not user.is_authenticated:
         return []
-    
-    # 1. Who I already follow
-    already_following = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
-    
-    # 2. Mutual Follows (Followings of followings)
-    mutual_follows = User.objects.filter(
-        followers__follower_id__in=already_following
-    ).exclude(
-        Q(id=user.id) | Q(id__in=already_following)
-    ).annotate(
-        score=Count('id')
-    )
-    
-    # 3. People who liked the same memes (Shared interests)
-    liked_meme_ids = user.liked_memes.values_list('id', flat=True)
-    shared_interests = User.objects.filter(
-        liked_memes__id__in=liked_meme_ids
-    ).exclude(
-        Q(id=user.id) | Q(id__in=already_following)
-    ).annotate(
-        score=Count('id')
-    )
-    
-    # Combine and prioritize
-    # This is a simple combination. In a real app we'd weight them.
-    # We'll use a dictionary to merge scores if we wanted, but here let's just combine queries.
-    combined_ids = list(mutual_follows.values_list('id', flat=True)) + list(shared_interests.values_list('id', flat=True))
-    
+    return cached_suggestions(user, limit, build_smart_suggestions)
+
+def build_smart_suggestions(user, limit=None):
+    # Ranked by mutual follows and shared likes, see suggestions.py
+    ranked_ids = ranked_suggestion_ids(user.id, limit)
+    users = User.objects.in_bulk(ranked_ids)
+    suggestions = [users[user_id] for user_id in ranked_ids if user_id in users]
+
     # If not enough smart suggestions, add random ones
-    suggestions = User.objects.filter(id__in=combined_ids).distinct()
-    
-    count = suggestions.count()
-    if limit and count < limit:
-        random_ones = User.objects.exclude(
-            Q(id=user.id) | Q(id__in=already_following) | Q(id__in=combined_ids)
-        ).order_by('?')[:(limit - count)]
-        suggestions = list(suggestions) + list(random_ones)
-    elif limit:
-        suggestions = suggestions[:limit]
-        
+    if limit and len(suggestions) < limit:
+        already_following = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
+        excluded = {user.id, *already_following, *ranked_ids}
+        suggestions += sample(User.objects.all(), limit - len(suggestions), exclude=excluded)
+
     return suggestions
 
-def get_personalized_feed(user):
+def get_feed_tiers(user):
     if not user.is_authenticated:
-        return Meme.objects.all().annotate(like_count=Count('faa_likes')).order_by('-like_count', '-created_at')
+        return [(Meme.objects.all(), ('hot_score', 'id'))]
 
-    # 1. Following
-    following_ids = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
-    following_memes = Meme.objects.filter(author_id__in=following_ids).order_by('-created_at')
+    # 1. Following (materialized timeline, filled on upload and follow)
+    following_ids = list(Follow.objects.filter(follower=user).values_list('following_id', flat=True))
+    following_memes = timeline_queryset(user)
     
     # 2. Interest (Interacted authors)
     # Authors of memes I liked
@@ -71,41 +61,100 @@ def get_personalized_feed(user):
     interacted_author_ids.discard(user.id) # Remove self
     for fid in following_ids: interacted_author_ids.discard(fid) # Remove already following
     
-    interest_memes = Meme.objects.filter(author_id__in=interacted_author_ids).order_by('-created_at')
-    
-    # 3. Fallback (Popular & Latest)
-    # Exclude what we already have
-    seen_ids = set(list(following_memes.values_list('id', flat=True)) + list(interest_memes.values_list('id', flat=True)))
+    interest_memes = Meme.objects.filter(author_id__in=interacted_author_ids)
     
-    fallback_memes = Meme.objects.exclude(id__in=seen_ids).annotate(
-        like_count=Count('faa_likes')
-    ).order_by('-like_count', '-created_at')
+    # 3. Fallback (Hot: popular, decayed by age)
+    # Everything the first two tiers did not show. Followed authors are excluded by what is
+    # actually in the timeline, so memes older than the per-author backfill still turn up here.
+    fallback_memes = Meme.objects.exclude(author_id__in=interacted_author_ids).exclude(
+        id__in=TimelineEntry.objects.filter(user=user).values('meme_id')
+    )
     
-    # Combine results maintaining priority
-    # Converting to list to maintain order across different querysets
-    feed = list(following_memes) + list(interest_memes) + list(fallback_memes)
-    return feed
+    return [
+        (following_memes, ('created_at', 'meme_id')),
+        (interest_memes, ('created_at', 'id')),
+        (fallback_memes, ('hot_score', 'id')),
+    ]
+
+def get_personalized_feed(user, cursor=None, page_size=None):
+    # Returns one page of the feed (priority tiers kept in order) and the cursor for the next one
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    if not user.is_authenticated:
+        return build_feed_page(user, cursor, page_size)
+    return cached_feed_page(user, cursor, page_size, build_feed_page)
+
+def build_feed_page(user, cursor, page_size):
+    rows, next_cursor = paginate_tiers(get_feed_tiers(user), cursor=cursor, page_size=page_size)
+    memes = [row.meme if isinstance(row, TimelineEntry) else row for row in rows]
+    return memes, next_cursor
 
+def _anonymous_home_version(request):
+    # Only the logged-out page is shared by everyone; skip it while flash messages are pending
+    if request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    return content_version()
+
+def _home_etag(request):
+    version = _anonymous_home_version(request)
+    return version[0] if version else None
+
+def _home_last_modified(request):
+    version = _anonymous_home_version(request)
+    return version[1] if version else None
+
+def render_feed_cards(request, memes, already_following=()):
+    # Stripped so an empty page is falsy and home.html shows its empty state
+    return mark_safe(render_to_string('memes/_feed_page.html', {
+        'memes': hydrate_memes(memes, request.user),
+        'already_following': already_following,
+    }, request=request).strip())
+
+@condition(etag_func=_home_etag, last_modified_func=_home_last_modified)
 def home(request):
     comment_form = CommentForm()
     
     already_following = []
     suggested_users = []
-    memes = []
     
     if request.user.is_authenticated:
         already_following = Follow.objects.filter(follower=request.user).values_list('following_id', flat=True)
         suggested_users = get_smart_suggestions(request.user, limit=5)
-        memes = get_personalized_feed(request.user)
+        memes, next_cursor = get_personalized_feed(request.user)
+        feed_html = render_feed_cards(request, memes, already_following)
     else:
-        memes = Meme.objects.all().annotate(like_count=Count('faa_likes')).order_by('-like_count', '-created_at')
+        def render_page():
+            memes, next_cursor = get_personalized_feed(request.user)
+            return render_feed_cards(request, memes), next_cursor
+        feed_html, next_cursor = cached_anonymous_feed(render_page)
         
-    return render(request, 'memes/home.html', {
-        'memes': memes, 
+    response = render(request, 'memes/home.html', {
+        'feed_html': feed_html,
+        'next_cursor': next_cursor,
         'comment_form': comment_form,
         'suggested_users': suggested_users,
         'already_following': already_following
     })
+    if not request.user.is_authenticated:
+        # Let browsers and proxies keep the page but revalidate it with the ETag every time
+        patch_cache_control(response, no_cache=True)
+    return response
+
+def feed_page(request):
+    try:
+        memes, next_cursor = get_personalized_feed(request.user, cursor=request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+
+    already_following = []
+    if request.user.is_authenticated:
+        already_following = Follow.objects.filter(follower=request.user).values_list('following_id', flat=True)
+
+    return JsonResponse({
+        'status': 'success',
+        'html': render_feed_cards(request, memes, already_following),
+        'count': len(memes),
+        'next_cursor': next_cursor,
+    })
 
 @login_required
 def suggestions_all(request):
@@ -123,8 +172,16 @@ def upload_meme(request):
         if form.is_valid():
             meme = form.save(commit=False)
             meme.author = request.user
+            reused = fingerprint_upload(meme)
             meme.save()
-            messages.success(request, 'Meme uploaded successfully!')
+            if not reused:
+                enqueue_media(meme)
+            if meme.near_duplicate_of_id:
+                messages.info(request, f"This looks like a repost of @{meme.near_duplicate_of.author.username}'s meme.")
+            if meme.is_processing:
+                messages.success(request, 'Meme uploaded! It will appear once it has been processed.')
+            else:
+                messages.success(request, 'Meme uploaded successfully!')
             return redirect('home')
     else:
         form = MemeForm()
@@ -135,26 +192,13 @@ from django.http import JsonResponse
 @login_required
 def like_meme(request, meme_id):
     meme = get_object_or_404(Meme, id=meme_id)
-    liked = False
-    if request.user in meme.faa_likes.all():
-        meme.faa_likes.remove(request.user)
-    else:
-        meme.faa_likes.add(request.user)
-        liked = True
-        # Create notification
-        if meme.author != request.user:
-            Notification.objects.create(
-                recipient=meme.author,
-                sender=request.user,
-                meme=meme,
-                notification_type='like',
-                text_preview=f"{request.user.username} liked your meme"
-            )
+    # Buffered: the like, its notification and the counter are written by the next flush
+    liked, total_likes = toggle_like(request.user, meme)
     
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
             'liked': liked,
-            'total_likes': meme.total_faa_likes
+            'total_likes': total_likes
         })
     return redirect('home')
 
@@ -175,26 +219,22 @@ def add_comment(request, meme_id):
                 comment.parent = parent_comment
             
             comment.save()
+            meme.refresh_from_db(fields=['comments_count'])
             
-            # Create notification
-            if meme.author != request.user:
-                Notification.objects.create(
-                    recipient=meme.author,
-                    sender=request.user,
-                    meme=meme,
-                    notification_type='comment',
-                    text_preview=f"{request.user.username} commented: {comment.content[:30]}..."
-                )
+            notify([Event(
+                meme.author_id, request.user.id, 'comment', meme.id,
+                f"{request.user.username} commented: {comment.content[:30]}..."
+            )])
             
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({
                     'status': 'success',
                     'comment_id': comment.id,
                     'username': comment.author.username,
-                    'profile_pic_url': comment.author.profile.profile_pic.url,
+                    'profile_pic_url': comment.author.profile.avatar_url,
                     'content': comment.content,
                     'created_at': 'Just now',
-                    'total_comments': meme.comments.count(),
+                    'total_comments': meme.comments_count,
                     'is_reply': bool(comment.parent),
                     'parent_id': comment.parent.id if comment.parent else None
                 })
@@ -204,7 +244,7 @@ def add_comment(request, meme_id):
 def like_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)
     liked = False
-    if request.user in comment.likes.all():
+    if comment.likes.filter(id=request.user.id).exists():
         comment.likes.remove(request.user)
     else:
         comment.likes.add(request.user)
@@ -219,14 +259,32 @@ def like_comment(request, comment_id):
 
 @login_required
 def notifications(request):
-    notifs = Notification.objects.filter(recipient=request.user).order_by('-created_at')
-    # Mark as read
-    notifs.filter(is_read=False).update(is_read=True)
-    return render(request, 'memes/notifications.html', {'notifications': notifs})
+    cursor = request.GET.get('cursor')
+    queryset = Notification.objects.filter(recipient=request.user).select_related('sender__profile', 'meme')
+    try:
+        notifs, next_cursor = paginate_tiers(
+            [(queryset, ('updated_at', 'id'))], cursor, settings.NOTIFICATIONS_PAGE_SIZE
+        )
+    except InvalidCursor:
+        return redirect('notifications')
+
+    watermark = seen_at(request.user)
+    for notif in notifs:
+        notif.is_unread = watermark is None or notif.updated_at > watermark
+    # Opening the newest page marks everything up to its first item as read
+    if notifs and not cursor and notifs[0].is_unread:
+        mark_seen(request.user, notifs[0].updated_at)
+    return render(request, 'memes/notifications.html', {'notifications': notifs, 'next_cursor': next_cursor})
+
+def get_profile_page(profile_user, cursor=None):
+    # One page of the user's memes, newest first, and the cursor for the next one
+    return paginate_tiers(
+        [(profile_user.memes.all(), ('created_at', 'id'))], cursor=cursor, page_size=settings.PROFILE_PAGE_SIZE
+    )
 
 def user_profile(request, username):
     profile_user = get_object_or_404(User, username=username)
-    memes = profile_user.memes.all().order_by('-created_at')
+    memes, next_cursor = get_profile_page(profile_user)
     
     followers_count = profile_user.followers.count()
     following_count = profile_user.following.count()
@@ -238,13 +296,31 @@ def user_profile(request, username):
         
     return render(request, 'memes/user_profile.html', {
         'profile_user': profile_user, 
-        'memes': memes,
+        'memes': hydrate_memes(memes, request.user),
+        'next_cursor': next_cursor,
+        'memes_count': profile_user.memes.count(),
         'followers_count': followers_count,
         'following_count': following_count,
         'is_following': is_following,
         'is_blocked': is_blocked
     })
 
+def profile_memes(request, username):
+    profile_user = get_object_or_404(User, username=username)
+    try:
+        memes, next_cursor = get_profile_page(profile_user, cursor=request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'html': render_to_string('memes/_profile_page.html', {
+            'memes': hydrate_memes(memes, request.user),
+        }, request=request),
+        'count': len(memes),
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def toggle_follow(request, username):
     to_follow = get_object_or_404(User, username=username)
@@ -258,13 +334,7 @@ def toggle_follow(request, username):
     else:
         Follow.objects.create(follower=request.user, following=to_follow)
         action = 'followed'
-        # Notification
-        Notification.objects.create(
-            recipient=to_follow,
-            sender=request.user,
-            notification_type='follow',
-            text_preview=f"{request.user.username} started following you"
-        )
+        notify([Event(to_follow.id, request.user.id, 'follow', None, f"{request.user.username} started following you")])
         
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
@@ -277,22 +347,34 @@ def toggle_follow(request, username):
 
 def search(request):
     query = request.GET.get('q', '')
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     users = []
     memes = []
+    has_next = False
     if query:
-        users = User.objects.filter(
-            Q(username__icontains=query) | 
-            Q(first_name__icontains=query) | 
-            Q(last_name__icontains=query)
-        ).distinct()
-        memes = Meme.objects.filter(caption__icontains=query).order_by('-created_at')
+        page_size = settings.SEARCH_PAGE_SIZE
+        users, more_users = search_users(query, page, page_size)
+        memes, more_memes = search_memes(query, page, page_size)
+        memes = hydrate_authors(memes)
+        has_next = more_users or more_memes
     
     return render(request, 'memes/search_results.html', {
         'users': users,
         'memes': memes,
-        'query': query
+        'query': query,
+        'page': page,
+        'has_next': has_next
     })
 
+def user_typeahead(request):
+    # Prefix matches for autocomplete, answered from the in-memory index
+    viewer_id = request.user.id if request.user.is_authenticated else None
+    users = typeahead.search(request.GET.get('q', ''), viewer_id, settings.TYPEAHEAD_LIMIT)
+    return JsonResponse({'users': users})
+
 def get_followers(request, username):
     user = get_object_or_404(User, username=username)
     followers = user.followers.all()
@@ -301,7 +383,7 @@ def get_followers(request, username):
         user_list.append({
             'id': f.follower.id,
             'username': f.follower.username,
-            'profile_pic_url': f.follower.profile.profile_pic.url
+            'profile_pic_url': f.follower.profile.avatar_url
         })
     return JsonResponse({'users': user_list})
 
@@ -313,6 +395,6 @@ def get_following(request, username):
         user_list.append({
             'id': f.following.id,
             'username': f.following.username,
-            'profile_pic_url': f.following.profile.profile_pic.url
+            'profile_pic_url': f.following.profile.avatar_url
         })
     return JsonResponse({'users': user_list})